@@ -0,0 +1,180 @@
+"""Vectorized vital-sign trend analytics for the Patient Tracker backend.
+
+Readings arrive as columns ({field: values}) straight from the vitals store
+and are analysed as NumPy arrays sorted by patient then time, so a ward's
+trend never builds a Python object per reading: per-patient figures are
+reductions over each patient's contiguous run of rows. Results hold NumPy
+arrays, which ORJSONResponse serializes natively (NaN becomes null).
+"""
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+TREND_METRICS = ("heart_rate", "temperature", "respiratory_rate", "spo2", "systolic_bp", "diastolic_bp", "pain_score")
+FLUID_FIELDS = ("iv_fluids_volume", "oral_intake", "urine_output")
+COLUMNS = ("patient_id", "patient_name", "monitoring_datetime", "blood_pressure", *TREND_METRICS, *FLUID_FIELDS)
+
+# Readings stored before blood pressure was parsed on insert
+BLOOD_PRESSURE_PATTERN = r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$"
+# oral_intake is free text ("water 200 ml", "50% of meal"); only millilitres count as intake
+ORAL_INTAKE_ML_PATTERN = r"(?i)(\d+(?:\.\d+)?)\s*ml\b"
+
+HOUR = np.timedelta64(1, "h")
+
+
+def text_numbers(values, pattern: str) -> np.ndarray:
+    """The groups of pattern in each value as floats, NaN where it does not match.
+
+    Free-text fields repeat a handful of values, so the regex runs once per distinct value.
+    """
+    codes, distinct = pd.factorize(pd.Series(values, dtype="string"))
+    extracted = pd.Series(distinct, dtype="string").str.extract(pattern).astype(float).to_numpy()
+    # Missing values are coded -1, which picks the trailing NaN row
+    return np.vstack([extracted, np.full((1, extracted.shape[1]), np.nan)])[codes]
+
+
+class Readings:
+    """Readings in [start, end) as arrays sorted by patient then time.
+
+    Patient p's rows are starts[p]:starts[p + 1]; metrics has a column per
+    TREND_METRICS entry, NaN where a value was not recorded.
+    """
+
+    def __init__(self, columns: Dict[str, list], start: datetime, end: datetime):
+        times = np.array(columns["monitoring_datetime"], dtype="datetime64[ms]")
+        in_range = (times >= np.datetime64(start, "ms")) & (times < np.datetime64(end, "ms"))
+        codes, self.patient_ids = pd.factorize(pd.Series(columns["patient_id"], dtype=object)[in_range], sort=True)
+        order = np.lexsort((times[in_range], codes))
+        selected = np.flatnonzero(in_range)[order]
+
+        def column(field, dtype=object):
+            return np.array(columns[field], dtype=dtype)[selected]
+
+        self.times = times[selected]
+        self.codes = codes[order]
+        self.starts = np.searchsorted(self.codes, np.arange(len(self.patient_ids) + 1))
+        self.names = column("patient_name")
+        self.metrics = np.column_stack([column(metric, float) for metric in TREND_METRICS])
+
+        pressures = [TREND_METRICS.index("systolic_bp"), TREND_METRICS.index("diastolic_bp")]
+        unparsed = np.isnan(self.metrics[:, pressures[0]])
+        if unparsed.any():
+            self.metrics[np.ix_(unparsed, pressures)] = text_numbers(column("blood_pressure")[unparsed], BLOOD_PRESSURE_PATTERN)
+
+        oral_ml = text_numbers(column("oral_intake"), ORAL_INTAKE_ML_PATTERN)[:, 0]
+        self.intake_ml = np.nan_to_num(column("iv_fluids_volume", float)) + np.nan_to_num(oral_ml)
+        self.output_ml = np.nan_to_num(column("urine_output", float))
+
+    def __len__(self):
+        return len(self.times)
+
+    def group_sums(self, values: np.ndarray) -> np.ndarray:
+        """values summed over each patient's rows."""
+        return np.add.reduceat(values, self.starts[:-1], axis=0)
+
+    def hours_since(self, moment: datetime) -> np.ndarray:
+        return (self.times - np.datetime64(moment, "ms")) / HOUR
+
+
+def rolling_means(readings: Readings, window_hours: int) -> np.ndarray:
+    """Each metric's mean over the window_hours up to and including every reading, per patient."""
+    # With hours counted from the earliest reading and span exceeding every
+    # patient's range plus a window, sorting by (patient, time) makes
+    # patient * span + hours increasing and keeps each window inside its
+    # patient, so each window's first row is a binary search away
+    hours = readings.hours_since(readings.times.min())
+    span = hours.max() + window_hours + 1
+    key = readings.codes * span + hours
+    first = np.searchsorted(key, key - window_hours, side="right")
+    last = np.arange(1, len(readings) + 1)
+
+    recorded = ~np.isnan(readings.metrics)
+    totals = np.vstack([np.zeros(readings.metrics.shape[1]), np.cumsum(np.where(recorded, readings.metrics, 0), axis=0)])
+    counts = np.vstack([np.zeros(readings.metrics.shape[1]), np.cumsum(recorded, axis=0)])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (totals[last] - totals[first]) / (counts[last] - counts[first])
+
+
+def slopes_per_hour(readings: Readings) -> np.ndarray:
+    """Least-squares slope of each metric against time in hours, per patient (NaN under two readings)."""
+    recorded = ~np.isnan(readings.metrics)
+    x = np.where(recorded, readings.hours_since(readings.times[0])[:, None], 0)
+    y = np.where(recorded, readings.metrics, 0)
+    n, sx, sy, sxy, sxx = (readings.group_sums(values) for values in (recorded.astype(float), x, y, x * y, x * x))
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+
+
+def out_of_range_counts(readings: Readings, ranges: Dict[str, List[Tuple]]) -> Dict[str, np.ndarray]:
+    """Readings per patient whose metric falls in any of its [low, high) ranges (None = unbounded)."""
+    counts = {}
+    for metric, bounds in ranges.items():
+        values = readings.metrics[:, TREND_METRICS.index(metric)]
+        outside = np.zeros(len(readings), dtype=bool)
+        for low, high in bounds:
+            outside |= (values >= (-np.inf if low is None else low)) & (values < (np.inf if high is None else high))
+        counts[metric] = readings.group_sums(outside.astype(np.int64))
+    return counts
+
+
+def fluid_intervals(readings: Readings, start: datetime, window_hours: int) -> tuple:
+    """(patient codes, interval starts, intake, output) summed per patient per window_hours from start.
+
+    Only intervals with readings are listed, sorted by patient then time.
+    """
+    interval = (readings.hours_since(start) // window_hours).astype(np.int64)
+    intervals_per_patient = int(interval.max()) + 1
+    keys, inverse = np.unique(readings.codes * intervals_per_patient + interval, return_inverse=True)
+    intake = np.bincount(inverse, weights=readings.intake_ml, minlength=len(keys))
+    output = np.bincount(inverse, weights=readings.output_ml, minlength=len(keys))
+    interval_starts = np.datetime64(start, "ms") + (keys % intervals_per_patient) * window_hours * HOUR
+    return keys // intervals_per_patient, interval_starts, intake, output
+
+
+def vitals_trends(
+    columns: Dict[str, list], start: datetime, end: datetime, window_hours: int, ranges: Dict[str, List[Tuple]]
+) -> dict:
+    """Per-patient rolling means, slopes, out-of-range counts and fluid balance over [start, end)."""
+    readings = Readings(columns, start, end)
+    result = {"start": start, "end": end, "window_hours": window_hours, "patients": []}
+    if not len(readings):
+        return result
+
+    # Metric-major, so each patient's run of a metric is a contiguous slice for orjson
+    means = np.ascontiguousarray(rolling_means(readings, window_hours).T)
+    slopes = slopes_per_hour(readings).tolist()
+    out_of_range = {metric: counts.tolist() for metric, counts in out_of_range_counts(readings, ranges).items()}
+    interval_codes, interval_starts, intake, output = fluid_intervals(readings, start, window_hours)
+    interval_bounds = np.searchsorted(interval_codes, np.arange(len(readings.patient_ids) + 1))
+
+    for p, patient_id in enumerate(readings.patient_ids):
+        rows = slice(readings.starts[p], readings.starts[p + 1])
+        intervals = slice(interval_bounds[p], interval_bounds[p + 1])
+        patient_intake, patient_output = intake[intervals], output[intervals]
+        result["patients"].append({
+            "patient_id": patient_id,
+            "patient_name": readings.names[rows.stop - 1],
+            "readings": rows.stop - rows.start,
+            "latest": dict(zip(TREND_METRICS, readings.metrics[rows.stop - 1].tolist())),
+            "slope_per_hour": dict(zip(TREND_METRICS, slopes[p])),
+            "out_of_range": {metric: counts[p] for metric, counts in out_of_range.items()},
+            "rolling_mean": {
+                "monitoring_datetime": readings.times[rows],
+                **{metric: means[column, rows] for column, metric in enumerate(TREND_METRICS)},
+            },
+            "fluid_balance": {
+                "intake_ml": patient_intake.sum(),
+                "output_ml": patient_output.sum(),
+                "balance_ml": patient_intake.sum() - patient_output.sum(),
+                "intervals": {
+                    "start": interval_starts[intervals],
+                    "intake_ml": patient_intake,
+                    "output_ml": patient_output,
+                    "balance_ml": patient_intake - patient_output,
+                },
+            },
+        })
+    return result
@@ -0,0 +1,108 @@
+"""Maintenance commands and the production launcher for the Patient Tracker backend.
+
+Run from the backend directory, e.g. ``python manage.py rebuild-rollups`` or
+``python manage.py serve --workers 4 --max-connections 200``.
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import typer
+import uvicorn
+
+import server
+
+cli = typer.Typer(help="Patient Tracker maintenance commands")
+
+BACKEND_DIR = Path(__file__).parent
+
+
+@cli.callback()
+def main():
+    """Patient Tracker maintenance commands."""
+
+
+@cli.command()
+def serve(
+    workers: int = typer.Option(os.cpu_count() or 1, help="Worker processes, usually one per core"),
+    host: str = typer.Option("0.0.0.0", help="Interface to bind"),
+    port: int = typer.Option(8001, help="Port to bind"),
+    max_connections: int = typer.Option(
+        0, help="Mongo connections shared by all workers; each worker's pool gets an equal share"
+    ),
+):
+    """Run the API with several uvicorn workers, each with its own right-sized Mongo pool.
+
+    Workers are separate processes, so live events are relayed between them
+    through Mongo (EVENTS_RELAY) and Prometheus metrics are merged through
+    PROMETHEUS_MULTIPROC_DIR unless those are configured explicitly.
+    """
+    # Workers are spawned after this, so they read these in settings.py and server.py
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if max_connections:
+        if max_connections < workers:
+            typer.echo("--max-connections must allow at least one connection per worker", err=True)
+            raise typer.Exit(code=1)
+        os.environ["MONGO_MAX_CONNECTIONS"] = str(max_connections)
+    if workers > 1:
+        os.environ.setdefault("EVENTS_RELAY", "true")
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="patient-tracker-metrics-"))
+    typer.echo(f"Starting {workers} workers on {host}:{port}")
+    uvicorn.run("server:app", host=host, port=port, workers=workers, app_dir=str(BACKEND_DIR))
+
+
+@cli.command()
+def rebuild_rollups(batch_size: int = typer.Option(5000, help="Readings folded per bulk write")):
+    """Recompute all hourly and daily vital-sign rollups from raw readings."""
+    server.connect_mongo()
+    readings = asyncio.run(server.rebuild_rollups(batch_size=batch_size))
+    typer.echo(f"Rebuilt rollups from {readings} readings")
+
+
+@cli.command()
+def rebuild_census():
+    """Rebuild the ward census of occupied beds from the admitted patients."""
+    server.connect_mongo()
+    occupied = asyncio.run(server.rebuild_ward_census())
+    if occupied is None:
+        typer.echo("Another worker is rebuilding the ward census; try again once it finishes", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"Rebuilt the ward census with {occupied} occupied beds")
+
+
+@cli.command()
+def rebuild_alerts():
+    """Recompute every admitted patient's latest early-warning score from their newest reading."""
+    server.connect_mongo()
+    scored = asyncio.run(server.rebuild_early_warning_scores())
+    typer.echo(f"Scored the newest reading of {scored} patients")
+
+
+@cli.command()
+def migrate_vitals_storage(
+    source: str = typer.Option("documents", "--from", help="Current layout: documents or buckets"),
+    target: str = typer.Option("buckets", "--to", help="New layout: documents or buckets"),
+    batch_size: int = typer.Option(5000, help="Readings copied per batch"),
+    drop_source: bool = typer.Option(False, help="Drop the source collection after copying"),
+):
+    """Copy vital signs between the per-reading and bucketed storage layouts."""
+    server.connect_mongo()
+    try:
+        copied = asyncio.run(server.migrate_vitals_storage(source, target, batch_size, drop_source))
+    except ValueError as e:
+        typer.echo(f"Migration aborted: {e}", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"Copied {copied} readings from {source} to {target}; set VITALS_STORAGE={target} to use them")
+
+
+@cli.command()
+def resume_patient_jobs():
+    """Finish interrupted vital-sign purges of deleted patients and propagations of patient moves."""
+    server.connect_mongo()
+    resumed = asyncio.run(server.resume_patient_jobs())
+    typer.echo(f"Finished {resumed['patient_purges']} purges and {resumed['vitals_propagations']} propagations")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,27 +1,322 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, CursorType, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure, PyMongoError
+import io
 import os
+import re
+import csv
+import time
+import asyncio
+import json
+import math
+import orjson
+import base64
+import functools
+import hashlib
 import logging
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, List, Optional, Union
 import uuid
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 from enum import Enum
+from contextlib import asynccontextmanager
+
+import analytics
+import settings
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Requests slower than this many seconds are logged with their Mongo query
+# shapes; 0 disables the slow-request log
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '0'))
+
+# Prometheus metrics, served on /metrics
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to the first response byte, per route and status",
+    ["method", "route", "status"]
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Duration of each Mongo command",
+    ["command", "collection"]
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error",
+    ["command", "collection"]
+)
+MONGO_DOCUMENTS_RETURNED = Counter(
+    "mongo_documents_returned_total", "Documents returned to the app by find, aggregate and getMore",
+    ["collection"]
+)
+MONGO_REQUEST_COMMANDS = Histogram(
+    "http_request_mongo_commands", "Mongo commands issued per request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+)
+MONGO_REQUEST_DURATION = Histogram(
+    "http_request_mongo_duration_seconds", "Time spent in Mongo commands per request",
+    ["route"]
+)
+# Server-wide counters from serverStatus, refreshed on every scrape: a high
+# examined-to-returned ratio means queries are scanning instead of using indexes
+MONGO_SERVER_DOCUMENTS = Gauge(
+    "mongo_server_documents", "Documents examined by queries and returned to clients since the server started",
+    ["kind"], multiprocess_mode="max"
+)
+
+class RequestMongoStats:
+    """Mongo commands issued while serving one request."""
+
+    def __init__(self):
+        self.commands = 0
+        self.duration = 0.0
+        self.shapes = []
+        self._lock = threading.Lock()
+
+    def record_started(self, shape: dict):
+        with self._lock:
+            self.commands += 1
+            if SLOW_REQUEST_SECONDS:
+                self.shapes.append(shape)
+
+    def record_finished(self, seconds: float):
+        with self._lock:
+            self.duration += seconds
+
+# Motor runs commands on executor threads with a copy of the caller's
+# context, so the listener below sees the stats of the request it serves
+request_mongo_stats: ContextVar[Optional[RequestMongoStats]] = ContextVar("request_mongo_stats", default=None)
+
+def query_shape(value):
+    """Replace the literal values of a filter or pipeline with "?", keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(item) for item in value[:5]]
+    return "?"
+
+SHAPED_COMMAND_FIELDS = ("filter", "sort", "projection", "pipeline", "updates", "deletes", "query")
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every Mongo command and attributes it to the request being served."""
+
+    def __init__(self):
+        # Replies do not name their collection, so remember it from the started event
+        self._collections = {}
+
+    def started(self, event):
+        command = event.command
+        target = command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        self._collections[(event.connection_id, event.request_id)] = collection
+        stats = request_mongo_stats.get()
+        if stats is not None:
+            shape = {"command": event.command_name, "collection": collection}
+            if SLOW_REQUEST_SECONDS:
+                shape.update(
+                    (field, query_shape(command[field])) for field in SHAPED_COMMAND_FIELDS if field in command
+                )
+            stats.record_started(shape)
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(seconds)
+        cursor = event.reply.get("cursor")
+        if isinstance(cursor, dict):
+            MONGO_DOCUMENTS_RETURNED.labels(collection).inc(len(cursor.get("firstBatch", cursor.get("nextBatch", []))))
+        stats = request_mongo_stats.get()
+        if stats is not None:
+            stats.record_finished(seconds)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+        stats = request_mongo_stats.get()
+        if stats is not None:
+            stats.record_finished(event.duration_micros / 1e6)
+
+# MongoDB connection, opened by the lifespan handler in each worker process
+# (see settings.py for pool size, timeouts, read preference and write concern)
+client: Optional[AsyncIOMotorClient] = None
+db = None
+# The same database read through secondaries, for endpoints marked stale_reads_ok
+replica_db = None
+
+def connect_mongo():
+    """Create this process's Motor client; scripts call this before touching db."""
+    global client, db, replica_db
+    client = AsyncIOMotorClient(
+        settings.MONGO_URL, event_listeners=[MongoCommandMetrics()], **settings.mongo_client_options()
+    )
+    db = client[settings.DB_NAME]
+    replica_db = client.get_database(settings.DB_NAME, read_preference=settings.stale_read_preference())
+
+# Set while a stale_reads_ok endpoint runs, so the read helpers it calls use replica_db
+stale_reads_allowed: ContextVar[bool] = ContextVar("stale_reads_allowed", default=False)
+
+def read_db():
+    """The handle for reads: replica_db inside a stale_reads_ok endpoint, otherwise the primary."""
+    if stale_reads_allowed.get() and replica_db is not None:
+        return replica_db
+    return db
+
+def stale_reads_ok(endpoint):
+    """Mark a read-only endpoint whose data may lag by up to MONGO_MAX_STALENESS_SECONDS.
+
+    Only read_db() honours the mark; writes and anything using db directly stay on the primary.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        token = stale_reads_allowed.set(True)
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            stale_reads_allowed.reset(token)
+    return wrapper
+
+# Responses smaller than this many bytes are sent uncompressed
+GZIP_MINIMUM_SIZE = int(os.environ.get('GZIP_MINIMUM_SIZE', '1000'))
+
+# Seconds the dashboard overview stays cached between writes
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', '10'))
+
+# Patient auto-fill cache used when recording vital signs
+PATIENT_CACHE_SIZE = int(os.environ.get('PATIENT_CACHE_SIZE', '10000'))
+PATIENT_CACHE_TTL = float(os.environ.get('PATIENT_CACHE_TTL', '300'))
+
+# Default number of readings written per insert_many by the bulk endpoint
+VITALS_BULK_BATCH_SIZE = int(os.environ.get('VITALS_BULK_BATCH_SIZE', '500'))
+
+# Vital signs storage layout: "documents" (one document per reading) or
+# "buckets" (one document per patient per VITALS_BUCKET_HOURS with column arrays)
+VITALS_STORAGE = os.environ.get('VITALS_STORAGE', 'documents')
+VITALS_BUCKET_HOURS = int(os.environ.get('VITALS_BUCKET_HOURS', '6'))
+
+# Live event stream: keepalive interval, per-subscriber backlog, and whether to
+# relay events between workers through a capped collection
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get('STREAM_KEEPALIVE_SECONDS', '15'))
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', '1000'))
+EVENTS_RELAY = os.environ.get('EVENTS_RELAY', 'false').lower() == 'true'
+EVENTS_RELAY_BYTES = int(os.environ.get('EVENTS_RELAY_BYTES', str(16 * 1024 * 1024)))
+
+# Delta sync: how long deletions are remembered, and how far a caught-up
+# token rewinds to cover writes that committed after a sync read
+SYNC_TOMBSTONE_TTL_SECONDS = int(os.environ.get('SYNC_TOMBSTONE_TTL_SECONDS', str(30 * 24 * 3600)))
+SYNC_OVERLAP_SECONDS = float(os.environ.get('SYNC_OVERLAP_SECONDS', '5'))
+
+# Deleting a patient: histories of up to this many stored vital-sign documents
+# are removed in one transaction (replica sets only); larger ones, or any
+# without transactions, by a resumable purge job in batches, in the background
+# once past the limit
+PATIENT_PURGE_INLINE_DOCUMENTS = int(os.environ.get('PATIENT_PURGE_INLINE_DOCUMENTS', '5000'))
+PATIENT_PURGE_BATCH_SIZE = int(os.environ.get('PATIENT_PURGE_BATCH_SIZE', '1000'))
+
+# Early-warning score from which a patient is listed by GET /api/alerts: 2
+# means one red or two yellow MEOWS triggers
+MEOWS_ALERT_SCORE = int(os.environ.get('MEOWS_ALERT_SCORE', '2'))
+
+# Copying a patient's new name, ward or bed onto their vital signs: stored
+# documents rewritten per batch, and the pause between batches so a long
+# history does not saturate the primary
+VITALS_PROPAGATION_BATCH_SIZE = int(os.environ.get('VITALS_PROPAGATION_BATCH_SIZE', '500'))
+VITALS_PROPAGATION_BATCH_DELAY = float(os.environ.get('VITALS_PROPAGATION_BATCH_DELAY', '0.05'))
+
+# Seconds a worker holds a patient purge or propagation job; another worker
+# (or the next start) takes it over once the lease runs out
+PATIENT_JOB_LEASE_SECONDS = int(os.environ.get('PATIENT_JOB_LEASE_SECONDS', '60'))
+
+# Idempotency keys: how long a completed write can be replayed, and the lease
+# on a pending key. A running request renews its lease every quarter of the
+# timeout, so only a request that stopped renewing (its worker crashed) loses
+# the key to a retry. A renewal can block for up to MONGO_SOCKET_TIMEOUT_MS,
+# so keep the timeout well above that plus the renewal interval
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = float(os.environ.get('IDEMPOTENCY_PENDING_TIMEOUT_SECONDS', '120'))
+# Retry-After sent while a key's first request is still running
+IDEMPOTENCY_RETRY_AFTER_SECONDS = int(os.environ.get('IDEMPOTENCY_RETRY_AFTER_SECONDS', '1'))
+
+# Indexes required by the query patterns below, reconciled on startup
+INDEXES = {
+    "patients": [
+        IndexModel([("patient_id", ASCENDING)], name="patient_id_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("ward_number", ASCENDING), ("id", ASCENDING)], name="ward_number_id"),
+        IndexModel([("search_prefixes", ASCENDING)], name="search_prefixes"),
+        IndexModel([("search_trigrams", ASCENDING)], name="search_trigrams"),
+        IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+        IndexModel([("birthdate", ASCENDING)], name="birthdate"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "tombstones": [
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=SYNC_TOMBSTONE_TTL_SECONDS),
+    ],
+    "early_warning_scores": [
+        IndexModel(
+            [("ward_number", ASCENDING), ("ews_score", DESCENDING), ("monitoring_datetime", DESCENDING)],
+            name="ward_number_ews_score_monitoring_datetime"
+        ),
+        IndexModel([("ews_score", DESCENDING), ("monitoring_datetime", DESCENDING)], name="ews_score_monitoring_datetime"),
+    ],
+    "ward_census": [
+        IndexModel([("ward_number", ASCENDING), ("bed_number", ASCENDING)], name="ward_number_bed_number_unique", unique=True),
+    ],
+    "vital_signs_rollups": [
+        IndexModel(
+            [("scope", ASCENDING), ("key", ASCENDING), ("granularity", ASCENDING), ("bucket_start", ASCENDING)],
+            name="scope_key_granularity_bucket_start_unique", unique=True
+        ),
+    ],
+}
+
+# Index options that change behaviour and therefore count as drift
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A client injected beforehand (tests, benchmarks) is used as-is
+    if client is None:
+        connect_mongo()
+    app.state.index_report = await ensure_indexes()
+    await vitals_store.ensure_columns()
+    await backfill_search_fields()
+    await backfill_native_dates()
+    await drop_stored_ages()
+    await ensure_ward_census()
+    app.state.patient_jobs = asyncio.create_task(resume_patient_jobs())
+    if EVENTS_RELAY:
+        event_bus.relay = True
+        app.state.event_relay = asyncio.create_task(event_bus.run_relay())
+    try:
+        yield
+    finally:
+        relay = getattr(app.state, "event_relay", None)
+        if relay:
+            relay.cancel()
+        app.state.patient_jobs.cancel()
+        for task in background_jobs:
+            task.cancel()
+        client.close()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -37,13 +332,33 @@ class FluidStatus(str, Enum):
     COMPLETED = "completed"
     STOPPED = "stopped"
 
+class TriggerLevel(str, Enum):
+    YELLOW = "yellow"
+    RED = "red"
+
+class SearchMode(str, Enum):
+    PREFIX = "prefix"
+    FUZZY = "fuzzy"
+
+class DataFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class Granularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class View(str, Enum):
+    SUMMARY = "summary"
+    FULL = "full"
+
 
 # Patient Model
 class Patient(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     patient_id: str  # Unique hospital ID
     full_name: str
-    age: Optional[int] = None  # Auto-calculated
+    age: Optional[int] = None  # Derived from birthdate on read
     birthdate: date
     address: str
     ward_number: str
@@ -56,6 +371,19 @@ class Patient(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PatientSummary(BaseModel):
+    """The columns of the ward list, returned with view=summary."""
+    id: str
+    patient_id: str
+    full_name: str
+    age: Optional[int] = None
+    ward_number: str
+    bed_number: str
+    admission_date: date
+    diagnosis: str
+    high_risk: YesNoEnum
+    discharged: YesNoEnum
+
 class PatientCreate(BaseModel):
     patient_id: str
     full_name: str
@@ -80,6 +408,20 @@ class PatientUpdate(BaseModel):
     discharged: Optional[YesNoEnum] = None
     notes: Optional[str] = None
 
+# Ward census: the occupied beds of a ward
+class CensusBed(BaseModel):
+    bed_number: str
+    id: str  # Patient record
+    patient_id: str
+    full_name: str
+    admission_date: date
+    high_risk: YesNoEnum
+
+class WardCensus(BaseModel):
+    ward_number: str
+    occupied_beds: int
+    beds: List[CensusBed]
+
 
 # Vital Signs Model
 class VitalSigns(BaseModel):
@@ -103,7 +445,31 @@ class VitalSigns(BaseModel):
     urine_output: Optional[int] = None  # ml
     other_output: Optional[str] = ""  # vomitus, stool with description
     additional_notes: Optional[str] = ""
+    systolic_bp: Optional[int] = None  # Parsed from blood_pressure
+    diastolic_bp: Optional[int] = None  # Parsed from blood_pressure
+    ews_score: int = 0  # Early-warning score: 2 per red trigger, 1 per yellow
+    ews_triggers: Dict[str, TriggerLevel] = {}  # Parameter -> trigger level, abnormal parameters only
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # Bumped when patient fields are recopied
+
+class VitalSignsSummary(BaseModel):
+    """The columns of the vital signs table, returned with view=summary."""
+    id: str
+    patient_id: str
+    patient_name: str
+    ward_number: str
+    bed_number: str
+    monitoring_datetime: datetime
+    blood_pressure: str
+    heart_rate: int
+    temperature: float
+    respiratory_rate: int
+    spo2: int
+    pain_score: int
+    iv_fluids_type: Optional[str] = ""
+    iv_fluids_volume: Optional[int] = None
+    iv_fluids_status: Optional[FluidStatus] = None
+    iv_medications: Optional[str] = ""
 
 class VitalSignsCreate(BaseModel):
     patient_id: str
@@ -124,6 +490,65 @@ class VitalSignsCreate(BaseModel):
     additional_notes: Optional[str] = ""
 
 
+# Latest early-warning score of a patient
+class EarlyWarningAlert(BaseModel):
+    patient_id: str
+    patient_name: str
+    ward_number: str
+    bed_number: str
+    vital_signs_id: str
+    monitoring_datetime: datetime
+    ews_score: int
+    ews_triggers: Dict[str, TriggerLevel]
+
+# Vital signs rollup models
+class MetricSummary(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+
+class VitalSignsRollup(BaseModel):
+    scope: str  # "patient" or "ward"
+    key: str  # Patient id or ward number
+    granularity: Granularity
+    bucket_start: datetime  # UTC
+    count: int
+    heart_rate: MetricSummary
+    temperature: MetricSummary
+    spo2: MetricSummary
+    pain_score: MetricSummary
+    urine_output_total: int = 0  # ml
+    iv_fluids_volume_total: int = 0  # ml
+
+
+# Bulk ingestion results
+class BulkItemError(BaseModel):
+    index: int  # Position of the item in the submitted array or stream
+    detail: Any
+
+class BulkIngestResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    errors: List[BulkItemError] = []
+
+
+# Offline outbox replay
+class OutboxRequest(BaseModel):
+    idempotency_key: str = Field(min_length=1, max_length=255)
+    method: str
+    path: str  # e.g. "/api/vital-signs" or "/api/patients/{id}"
+    body: dict
+
+class OutboxBatch(BaseModel):
+    requests: List[OutboxRequest] = Field(max_length=500)
+
+class OutboxResult(BaseModel):
+    idempotency_key: str
+    status_code: int
+    body: Any
+    retry: bool = False  # The first attempt is still running; replay the request later
+
+
 # Utility functions
 def calculate_age(birthdate: date) -> int:
     today = date.today()
@@ -132,54 +557,842 @@ def calculate_age(birthdate: date) -> int:
         age -= 1
     return age
 
+def utc_naive(moment: datetime) -> datetime:
+    """Express a datetime as naive UTC, the form Mongo returns it in."""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+async def bulk_upsert(collection, operations: List[UpdateOne]):
+    """Run unordered upserts, retrying once those that lost a race to create the same document."""
+    if not operations:
+        return
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        retry = [operations[error["index"]] for error in write_errors if error.get("code") == 11000]
+        if len(retry) < len(write_errors):
+            raise
+        await collection.bulk_write(retry, ordered=False)
+
+class TTLCache:
+    """Small in-process cache whose entries expire after ttl seconds.
+
+    Each entry records the version it was computed for and is only served
+    for that version, so a key holds one entry however often the version
+    changes. Concurrent misses for the same cache are computed once, and a
+    value computed across an invalidate() is returned but not stored.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, key, version):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic() and entry[1] == version:
+            return entry
+        return None
+
+    async def get_or_compute(self, key, compute, version=None):
+        entry = self._fresh(key, version)
+        if entry:
+            return entry[2]
+        async with self._lock:
+            entry = self._fresh(key, version)
+            if entry:
+                return entry[2]
+            generation = self._generation
+            value = await compute()
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            return value
+
+    def invalidate(self):
+        self._entries.clear()
+        self._generation += 1
+
+stats_cache = TTLCache(STATS_CACHE_TTL)
+
+# Conditional GETs: every write bumps a change version per collection, and
+# list responses carry an ETag derived from the versions they read, so a
+# matching If-None-Match is answered with 304 before running any query
+async def record_change(*collections: str):
+    """Mark collections as written: bump their change versions and drop cached stats."""
+    stats_cache.invalidate()
+    await bulk_upsert(db.change_versions, [
+        UpdateOne(
+            {"_id": name},
+            {"$inc": {"version": 1}, "$setOnInsert": {"epoch": str(uuid.uuid4())}},
+            upsert=True
+        )
+        for name in collections
+    ])
+
+async def change_etag(collections: tuple, *parts) -> str:
+    """A weak ETag for a response built from collections, varied by parts (query string, date).
+
+    Read through the same handle as the data, so a lagging secondary never
+    pairs old data with a newer version.
+    """
+    versions = {
+        version["_id"]: f"{version['epoch']}.{version['version']}"
+        async for version in read_db().change_versions.find({"_id": {"$in": list(collections)}})
+    }
+    key = "|".join([*(f"{name}:{versions.get(name, 0)}" for name in collections), *map(str, parts)])
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+def validator_headers(etag: str) -> dict:
+    # no-cache: clients may store the response but must revalidate before reuse
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag))
+
+class LRUCache:
+    """Bounded in-process cache with per-entry expiry and hit/miss counters.
+
+    Callers take generation() before reading from the database and pass it
+    to set(), so a value read before an invalidate() is never cached.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, generation: int):
+        if generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self._generation += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+patient_cache = LRUCache(PATIENT_CACHE_SIZE, PATIENT_CACHE_TTL)
+PATIENT_CACHE_PROJECTION = {"_id": 0, "id": 1, "full_name": 1, "ward_number": 1, "bed_number": 1}
+
+async def get_patient_summaries(patient_ids) -> dict:
+    """Name, ward and bed for each known patient id, from the cache or one $in query."""
+    summaries = {}
+    missing = []
+    for patient_id in set(patient_ids):
+        summary = patient_cache.get(patient_id)
+        if summary is None:
+            missing.append(patient_id)
+        else:
+            summaries[patient_id] = summary
+    if missing:
+        generation = patient_cache.generation()
+        async for patient in db.patients.find({"id": {"$in": missing}}, PATIENT_CACHE_PROJECTION):
+            patient_cache.set(patient["id"], patient, generation)
+            summaries[patient["id"]] = patient
+    return summaries
+
+class EventBus:
+    """Fans write events out to every live stream subscriber.
+
+    The write endpoints publish once and each subscriber gets the event on
+    its own bounded queue, so N open ward boards cost no extra queries. With
+    EVENTS_RELAY enabled, events are also written to a capped collection that
+    every worker tails once, so boards see writes made through other workers.
+    """
+
+    relay_collection = "events"
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.origin = uuid.uuid4().hex
+        self.relay = False
+        self._subscribers = {}
+        self._listeners = []
+        self._pending = set()
+
+    def add_listener(self, listener):
+        """Call listener(event) for every event, including those relayed from other workers."""
+        self._listeners.append(listener)
+
+    def subscribe(self, ward: Optional[str] = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = ward
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.pop(queue, None)
+
+    def publish(self, event_type: str, wards, data):
+        if isinstance(data, dict):
+            data = {key: value for key, value in data.items() if key != "_id"}
+        event = {
+            "type": event_type,
+            "wards": sorted({ward for ward in wards if ward}),
+            "data": jsonable_encoder(data),
+            "origin": self.origin,
+        }
+        self.deliver(event)
+        if self.relay:
+            task = asyncio.create_task(db[self.relay_collection].insert_one(dict(event)))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def deliver(self, event: dict):
+        for listener in self._listeners:
+            listener(event)
+        for queue, ward in list(self._subscribers.items()):
+            if ward and ward not in event["wards"]:
+                continue
+            if queue.full():
+                # A subscriber that stopped reading loses its oldest events, not new ones
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def run_relay(self):
+        """Tail the capped events collection and deliver events published by other workers."""
+        try:
+            await db.create_collection(self.relay_collection, capped=True, size=EVENTS_RELAY_BYTES)
+        except CollectionInvalid:
+            pass
+        # A tailable cursor on an empty collection dies at once, so start from a marker
+        marker = await db[self.relay_collection].insert_one({"type": "relay.started", "origin": self.origin})
+        last_id = marker.inserted_id
+        while True:
+            try:
+                cursor = db[self.relay_collection].find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        if event.get("origin") != self.origin and "data" in event:
+                            self.deliver(event)
+                    await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Event relay interrupted, retrying: {e}")
+            await asyncio.sleep(1)
+
+event_bus = EventBus()
+
+def invalidate_patient_cache(event: dict):
+    # Relayed events keep other workers' caches consistent when EVENTS_RELAY is on
+    if event["type"] in ("patient.updated", "patient.deleted"):
+        patient_cache.invalidate(event["data"]["id"])
+
+event_bus.add_listener(invalidate_patient_cache)
+
+def request_in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=409, detail="Request with this Idempotency-Key is in progress",
+        headers={"Retry-After": str(IDEMPOTENCY_RETRY_AFTER_SECONDS)}
+    )
+
+async def renew_idempotency_key(key: str, owner: str, request: asyncio.Task):
+    """Renew a pending key's lease while its request runs, cancelling the request if a retry took the key over."""
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PENDING_TIMEOUT_SECONDS / 4)
+        renewed = await db.idempotency_keys.update_one(
+            {"key": key, "owner": owner, "status": "pending"}, {"$set": {"created_at": datetime.utcnow()}}
+        )
+        if not renewed.matched_count:
+            request.cancel()
+            return
+
+async def with_idempotency(key: Optional[str], scope: str, payload: BaseModel, action):
+    """Run action once per Idempotency-Key and replay its stored result for retries.
+
+    A key reused with a different request is rejected, and a key whose first
+    request is still running answers 409 with Retry-After, which tells it
+    apart from conflicts a retry cannot fix. Each claim of a key records an
+    owner token: the running request keeps renewing its lease, and a request
+    whose key was taken over is cancelled and can neither store its result
+    nor release the key. Failed requests release their key so the client
+    can retry.
+    """
+    if not key:
+        return await action()
+    
+    fingerprint = hashlib.sha256(f"{scope}\n{payload.model_dump_json()}".encode()).hexdigest()
+    owner = str(uuid.uuid4())
+    now = datetime.utcnow()
+    try:
+        await db.idempotency_keys.insert_one(
+            {"key": key, "fingerprint": fingerprint, "status": "pending", "owner": owner, "created_at": now}
+        )
+    except DuplicateKeyError:
+        record = await db.idempotency_keys.find_one({"key": key})
+        if not record:
+            raise request_in_progress()
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if record["status"] == "completed":
+            return record["response"]
+        # Take over a pending key whose lease ran out (e.g. a crashed worker)
+        stale = now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+        claimed = await db.idempotency_keys.find_one_and_update(
+            {"key": key, "status": "pending", "created_at": {"$lt": stale}},
+            {"$set": {"created_at": now, "owner": owner}}
+        )
+        if not claimed:
+            raise request_in_progress()
+    
+    request = asyncio.ensure_future(action())
+    renewal = asyncio.create_task(renew_idempotency_key(key, owner, request))
+    try:
+        result = await request
+    except asyncio.CancelledError:
+        if renewal.done() and not renewal.cancelled() and renewal.exception() is None:
+            logger.warning("Request with Idempotency-Key %s was cancelled after a retry took the key over", key)
+            raise request_in_progress()
+        await db.idempotency_keys.delete_one({"key": key, "owner": owner, "status": "pending"})
+        raise
+    except BaseException:
+        await db.idempotency_keys.delete_one({"key": key, "owner": owner, "status": "pending"})
+        raise
+    finally:
+        renewal.cancel()
+    stored = await db.idempotency_keys.update_one(
+        {"key": key, "owner": owner},
+        {"$set": {"status": "completed", "response": jsonable_encoder(result)}}
+    )
+    if not stored.matched_count:
+        logger.warning("Request with Idempotency-Key %s finished after a retry took the key over", key)
+    return result
+
+# Patient search: normalized prefix tokens and trigrams stored on each patient
+SEARCH_FIELDS = ("full_name", "patient_id", "ward_number")
+SEARCH_PREFIX_MAX = 20
+SEARCH_MAX_TERMS = 8
+SEARCH_FUZZY_MIN_SIMILARITY = 0.5
+
+def normalize_search_text(text: str) -> List[str]:
+    """Lowercase, strip accents and split text into alphanumeric words."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.findall(r"[^\W_]+", text)
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def build_search_fields(patient: dict) -> dict:
+    words = set()
+    for field in SEARCH_FIELDS:
+        words.update(normalize_search_text(patient.get(field)))
+    # Also index the patient ID without separators so "MAT-001" matches "mat001"
+    words.add("".join(normalize_search_text(patient.get("patient_id"))))
+    words.discard("")
+    prefixes = set()
+    grams = set()
+    for word in words:
+        prefixes.update(word[:i] for i in range(1, min(len(word), SEARCH_PREFIX_MAX) + 1))
+        grams.update(trigrams(word))
+    return {"search_prefixes": sorted(prefixes), "search_trigrams": sorted(grams)}
+
+def search_filter(search: str, mode: SearchMode) -> Optional[dict]:
+    terms = normalize_search_text(search)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    if mode == SearchMode.PREFIX:
+        return {"search_prefixes": {"$all": [term[:SEARCH_PREFIX_MAX] for term in terms]}}
+    grams = sorted(set().union(*(trigrams(term) for term in terms)))
+    min_overlap = max(1, math.ceil(len(grams) * SEARCH_FUZZY_MIN_SIMILARITY))
+    return {
+        "search_trigrams": {"$in": grams},
+        "$expr": {"$gte": [
+            {"$size": {"$filter": {
+                "input": grams,
+                "cond": {"$in": ["$$this", {"$ifNull": ["$search_trigrams", []]}]},
+            }}},
+            min_overlap,
+        ]},
+    }
+
+def encode_cursor(values: list) -> str:
+    """Pack the sort keys of the last returned row into an opaque cursor."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """The sort keys packed by encode_cursor; 400 unless they are size strings or numbers.
+
+    The values go straight into query filters, so anything else (an object
+    such as {"$regex": ...}) would be read as an operator.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(query: dict, key: str, value, last_id: str, descending: bool = False) -> dict:
+    """Restrict query to rows after (value, last_id) in (key, id) sort order."""
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [{key: {op: value}}, {key: value, "id": {op: last_id}}]}
+    return {"$and": [query, after]} if query else after
+
+
+# Patient helpers
+# Stored patients keep birthdate and admission_date as BSON dates (midnight
+# UTC, since BSON has no date-only type); every other Patient field is stored
+# as-is. Reads project just the Patient fields and go out through orjson.
+PATIENT_FIELDS = list(Patient.model_fields)
+PATIENT_DATE_FIELDS = ("birthdate", "admission_date")
+PATIENT_PROJECTION = {"_id": 0, **{field: 1 for field in PATIENT_FIELDS}}
+PATIENT_VIEWS = {View.SUMMARY: list(PatientSummary.model_fields), View.FULL: PATIENT_FIELDS}
+
+def to_bson_date(value: date) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+def from_bson_date(value) -> Optional[date]:
+    """A stored date as a date; ISO strings written before dates were native are still read."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+def patient_to_document(values: dict) -> dict:
+    """Convert Patient field values to their stored form, in place."""
+    for field in PATIENT_DATE_FIELDS:
+        value = values.get(field)
+        if isinstance(value, date) and not isinstance(value, datetime):
+            values[field] = to_bson_date(value)
+    return values
+
+def patient_from_document(patient: dict, fields: List[str] = PATIENT_FIELDS) -> dict:
+    """The API form of a stored patient, limited to fields.
+
+    Documents read through find_patients already carry their age; it is
+    only calculated here for single documents fetched on the write paths.
+    """
+    row = {field: patient.get(field) for field in fields}
+    for field in PATIENT_DATE_FIELDS:
+        if field in row:
+            row[field] = from_bson_date(row[field])
+    if "age" in row and "age" not in patient and patient.get("birthdate"):
+        row["age"] = calculate_age(from_bson_date(patient["birthdate"]))
+    return row
+
+def age_expression(today: date) -> dict:
+    """Aggregation expression for the whole years between birthdate and today, null without a birthdate."""
+    birthday = {"$add": [{"$multiply": [{"$month": "$birthdate"}, 100]}, {"$dayOfMonth": "$birthdate"}]}
+    age = {"$subtract": [
+        {"$subtract": [today.year, {"$year": "$birthdate"}]},
+        {"$cond": [{"$gt": [birthday, today.month * 100 + today.day]}, 1, 0]}
+    ]}
+    return {"$cond": [{"$ifNull": ["$birthdate", False]}, age, None]}
+
+def find_patients(query: dict, sort: list, limit: Optional[int] = None, fields: List[str] = PATIENT_FIELDS):
+    """Aggregation cursor over matching patients, projected to fields with age derived by the server."""
+    pipeline = [{"$match": query}, {"$sort": dict(sort)}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    if "age" in projection:
+        projection["age"] = age_expression(date.today())
+    pipeline.append({"$project": projection})
+    return read_db().patients.aggregate(pipeline)
+
+def years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # 29 February in a year that has none
+        return day.replace(year=day.year - years, day=28)
+
+def age_range_filter(age_min: Optional[int], age_max: Optional[int]) -> dict:
+    """Birthdate bounds for patients aged age_min to age_max years, inclusive, today."""
+    if age_min is not None and age_max is not None and age_min > age_max:
+        raise HTTPException(status_code=400, detail="age_min must not be greater than age_max")
+    today = date.today()
+    bounds = {}
+    if age_min is not None:
+        bounds["$lte"] = to_bson_date(years_before(today, age_min))
+    if age_max is not None:
+        bounds["$gt"] = to_bson_date(years_before(today, age_max + 1))
+    return {"birthdate": bounds} if bounds else {}
+
+def build_patient(patient: PatientCreate) -> dict:
+    """Return the document to store for a new patient."""
+    now = datetime.utcnow()
+    patient_doc = patient_to_document(patient.dict())
+    patient_doc.update(id=str(uuid.uuid4()), created_at=now, updated_at=now)
+    patient_doc.update(build_search_fields(patient_doc))
+    return patient_doc
+
+# Ward census: a ward_census document per admitted patient, keyed by the
+# patient record, whose unique ward and bed index rejects double assignments
+CENSUS_FIELDS = ("patient_id", "full_name", "ward_number", "bed_number", "admission_date", "high_risk", "discharged")
+
+def census_entry(patient: dict) -> Optional[dict]:
+    """The census document for a stored patient, or None once discharged."""
+    if patient["discharged"] == YesNoEnum.YES:
+        return None
+    return {"_id": patient["id"], **{field: patient[field] for field in CENSUS_FIELDS if field != "discharged"}}
+
+async def bed_taken(ward_number: str, bed_number: str) -> HTTPException:
+    occupant = await db.ward_census.find_one({"ward_number": ward_number, "bed_number": bed_number}, {"full_name": 1, "patient_id": 1})
+    detail = f"Bed {bed_number} in ward {ward_number} is already occupied"
+    if occupant:
+        detail += f" by {occupant['full_name']} ({occupant['patient_id']})"
+    return HTTPException(status_code=409, detail=detail)
+
+async def assign_bed(patient: dict):
+    """Point the patient's census entry at their bed, or drop it once discharged; 409 if the bed is taken."""
+    entry = census_entry(patient)
+    if entry is None:
+        await db.ward_census.delete_one({"_id": patient["id"]})
+        return
+    try:
+        await db.ward_census.replace_one({"_id": patient["id"]}, entry, upsert=True)
+    except DuplicateKeyError:
+        raise await bed_taken(patient["ward_number"], patient["bed_number"])
+
+async def resync_census_entry(patient_db_id: str):
+    """Realign a patient's census entry with the stored patient after a write was abandoned."""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in CENSUS_FIELDS}}
+    patient = await db.patients.find_one({"id": patient_db_id}, projection)
+    if not patient:
+        await db.ward_census.delete_one({"_id": patient_db_id})
+        return
+    try:
+        await assign_bed(patient)
+    except HTTPException:
+        logger.warning("Patient %s shares bed %s in ward %s", patient_db_id, patient["bed_number"], patient["ward_number"])
+
+# Census rebuilds fill a scratch collection and rename it over the census, so
+# the live unique index keeps rejecting double assignments throughout; a lease
+# on the census_rebuilds document stops two workers rebuilding at once
+CENSUS_REBUILD_ID = "ward_census"
+CENSUS_SCRATCH_COLLECTION = "ward_census_rebuild"
+
+async def rebuild_ward_census(batch_size: int = 1000) -> Optional[int]:
+    """Rebuild the census from the admitted patients and return the occupied beds.
+
+    Where stored patients share a bed, the most recently updated keeps it
+    and the others are logged. Returns None while another worker holds the
+    rebuild lease.
+    """
+    await db.census_rebuilds.update_one(
+        {"_id": CENSUS_REBUILD_ID}, {"$setOnInsert": {"lease_until": datetime.min}}, upsert=True
+    )
+    if not await claim_job(db.census_rebuilds, CENSUS_REBUILD_ID):
+        return None
+    
+    # Writes landing after this are reapplied once the rebuilt census is live
+    started = datetime.utcnow() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+    scratch = db[CENSUS_SCRATCH_COLLECTION]
+    await scratch.drop()
+    await scratch.create_indexes(INDEXES["ward_census"])
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in CENSUS_FIELDS}}
+    cursor = db.patients.find({"discharged": {"$ne": YesNoEnum.YES}}, projection).sort("updated_at", -1)
+    occupied = 0
+    batch = []
+    async for patient in cursor:
+        batch.append(census_entry(patient))
+        if len(batch) >= batch_size:
+            occupied += await insert_census_entries(scratch, batch)
+            await db.census_rebuilds.update_one({"_id": CENSUS_REBUILD_ID}, job_lease())
+            batch = []
+    if batch:
+        occupied += await insert_census_entries(scratch, batch)
+    await scratch.rename("ward_census", dropTarget=True)
+    await reapply_census_writes(started)
+    
+    now = datetime.utcnow()
+    await db.census_rebuilds.update_one({"_id": CENSUS_REBUILD_ID}, {"$set": {"built_at": now, "lease_until": now}})
+    return occupied
+
+async def reapply_census_writes(since: datetime):
+    """Realign the census with patients written or deleted while it was being rebuilt.
+
+    Their entries are dropped first, so a bed freed during the rebuild is
+    free again before the patient who took it is reassigned.
+    """
+    updated = [
+        patient["id"]
+        async for patient in db.patients.find({"updated_at": {"$gte": since}}, {"_id": 0, "id": 1}).sort("updated_at", 1)
+    ]
+    deleted = [
+        tombstone["id"]
+        async for tombstone in db.tombstones.find({"kind": "patient", "deleted_at": {"$gte": since}}, {"_id": 0, "id": 1})
+    ]
+    await db.ward_census.delete_many({"_id": {"$in": updated + deleted}})
+    for patient_db_id in updated:
+        await resync_census_entry(patient_db_id)
+
+async def insert_census_entries(collection, entries: List[dict]) -> int:
+    """Insert entries, earlier ones first to a shared bed, and return how many were inserted."""
+    # An unordered insert may reorder, so beds shared within the batch are settled here
+    beds = set()
+    unique = []
+    for entry in entries:
+        bed = (entry["ward_number"], entry["bed_number"])
+        if bed in beds:
+            logger.warning("Patient %s shares bed %s in ward %s", entry["_id"], entry["bed_number"], entry["ward_number"])
+            continue
+        beds.add(bed)
+        unique.append(entry)
+    try:
+        await collection.insert_many(unique, ordered=False)
+        return len(unique)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            entry = unique[error["index"]]
+            logger.warning("Patient %s shares bed %s in ward %s", entry["_id"], entry["bed_number"], entry["ward_number"])
+        return e.details.get("nInserted", 0)
+
+async def ensure_ward_census() -> int:
+    """Build the census on first start; afterwards writes keep it current."""
+    if await db.census_rebuilds.find_one({"_id": CENSUS_REBUILD_ID, "built_at": {"$exists": True}}):
+        return 0
+    if await db.ward_census.estimated_document_count():
+        return 0
+    occupied = await rebuild_ward_census()
+    if occupied:
+        logger.info("Built the ward census with %d occupied beds", occupied)
+    return occupied or 0
+
+async def insert_patients_batch(batch: list, result: BulkIngestResult):
+    """Insert a batch of new patients, skipping patient IDs that already exist."""
+    patient_ids = [patient.patient_id for _, patient in batch]
+    existing = {
+        patient["patient_id"]
+        async for patient in db.patients.find({"patient_id": {"$in": patient_ids}}, {"_id": 0, "patient_id": 1})
+    }
+    
+    indexes = []
+    documents = []
+    for index, patient in batch:
+        if patient.patient_id in existing:
+            result.errors.append(BulkItemError(index=index, detail="Patient ID already exists"))
+            continue
+        existing.add(patient.patient_id)
+        indexes.append(index)
+        documents.append(build_patient(patient))
+    
+    # Claim beds first, so patients assigned to an occupied bed are not inserted
+    claims = [(position, census_entry(document)) for position, document in enumerate(documents)]
+    claims = [(position, entry) for position, entry in claims if entry]
+    taken = set()
+    try:
+        if claims:
+            await db.ward_census.insert_many([entry for _, entry in claims], ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            position, entry = claims[write_error["index"]]
+            taken.add(position)
+            result.errors.append(BulkItemError(
+                index=indexes[position], detail=f"Bed {entry['bed_number']} in ward {entry['ward_number']} is already occupied"
+            ))
+    indexes = [index for position, index in enumerate(indexes) if position not in taken]
+    documents = [document for position, document in enumerate(documents) if position not in taken]
+    if not documents:
+        return
+    
+    failed = set()
+    try:
+        await db.patients.insert_many(documents, ordered=False)
+        result.inserted += len(documents)
+    except BulkWriteError as e:
+        result.inserted += e.details.get("nInserted", 0)
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            result.errors.append(BulkItemError(index=indexes[write_error["index"]], detail=write_error["errmsg"]))
+        await db.ward_census.delete_many({"_id": {"$in": [documents[position]["id"] for position in failed]}})
+    for position, document in enumerate(documents):
+        if position not in failed:
+            event_bus.publish("patient.created", [document["ward_number"]], patient_from_document(document))
+
+def patient_row(patient: dict) -> dict:
+    """A stored patient as a CSV row."""
+    row = patient_from_document(patient)
+    for field in ("created_at", "updated_at"):
+        if isinstance(row[field], datetime):
+            row[field] = row[field].isoformat()
+    return row
+
+async def stream_patients_csv(cursor, rows_per_chunk: int = 200):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=PATIENT_FIELDS)
+    writer.writeheader()
+    rows = 0
+    async for patient in cursor:
+        writer.writerow(patient_row(patient))
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def stream_patients_ndjson(cursor):
+    async for patient in cursor:
+        yield orjson.dumps(patient_from_document(patient)) + b"\n"
+
 
 # Patient endpoints
 @api_router.post("/patients", response_model=Patient)
-async def create_patient(patient: PatientCreate):
+async def create_patient(patient: PatientCreate, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    return ORJSONResponse(
+        await with_idempotency(idempotency_key, "POST /patients", patient, lambda: insert_patient(patient))
+    )
+
+async def insert_patient(patient: PatientCreate) -> dict:
     # Check if patient_id already exists
-    existing = await db.patients.find_one({"patient_id": patient.patient_id})
+    existing = await db.patients.find_one({"patient_id": patient.patient_id}, {"_id": 1})
     if existing:
         raise HTTPException(status_code=400, detail="Patient ID already exists")
     
-    # Calculate age
-    age = calculate_age(patient.birthdate)
-    
-    patient_dict = patient.dict()
-    patient_dict["age"] = age
-    
-    # Convert date objects to strings for MongoDB storage
-    if isinstance(patient_dict.get("birthdate"), date):
-        patient_dict["birthdate"] = patient_dict["birthdate"].isoformat()
-    if isinstance(patient_dict.get("admission_date"), date):
-        patient_dict["admission_date"] = patient_dict["admission_date"].isoformat()
+    patient_doc = build_patient(patient)
+    await assign_bed(patient_doc)
+    try:
+        await db.patients.insert_one(patient_doc)
+    except DuplicateKeyError:
+        await db.ward_census.delete_one({"_id": patient_doc["id"]})
+        raise HTTPException(status_code=400, detail="Patient ID already exists")
+    await record_change("patients")
+    row = patient_from_document(patient_doc)
+    event_bus.publish("patient.created", [row["ward_number"]], row)
+    return row
+
+@api_router.post("/patients/import", response_model=BulkIngestResult)
+async def import_patients(
+    request: Request,
+    batch_size: int = Query(500, ge=1, le=5000, description="Patients checked and written per batch")
+):
+    """Import patients from a CSV (text/csv), NDJSON (application/x-ndjson) or JSON array body.
+
+    Rows whose patient_id already exists are reported by index and skipped.
+    """
+    result = BulkIngestResult()
+    batch = []
+    async for raw_item in iter_bulk_items(request):
+        index = result.received
+        result.received += 1
+        try:
+            item = json.loads(raw_item) if isinstance(raw_item, bytes) else raw_item
+            batch.append((index, PatientCreate.model_validate(item)))
+        except ValidationError as e:
+            result.errors.append(BulkItemError(index=index, detail=json.loads(e.json(include_url=False))))
+        except ValueError:
+            result.errors.append(BulkItemError(index=index, detail="Invalid JSON"))
+        if len(batch) >= batch_size:
+            await insert_patients_batch(batch, result)
+            batch = []
+    if batch:
+        await insert_patients_batch(batch, result)
     
-    patient_obj = Patient(**patient_dict)
+    if result.inserted:
+        await record_change("patients")
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
+@api_router.get("/patients/export")
+async def export_patients(
+    format: DataFormat = Query(DataFormat.CSV, description="csv or ndjson"),
+    discharged: Optional[bool] = Query(None, description="Filter by discharge status"),
+    ward: Optional[str] = Query(None, description="Filter by ward number"),
+    age_min: Optional[int] = Query(None, ge=0, le=150, description="Youngest age in years, inclusive"),
+    age_max: Optional[int] = Query(None, ge=0, le=150, description="Oldest age in years, inclusive")
+):
+    query = age_range_filter(age_min, age_max)
+    if discharged is not None:
+        query["discharged"] = YesNoEnum.YES if discharged else YesNoEnum.NO
+    if ward:
+        query["ward_number"] = ward
     
-    # Convert dates to strings in the dict for MongoDB
-    patient_doc = patient_obj.dict()
-    if isinstance(patient_doc.get("birthdate"), date):
-        patient_doc["birthdate"] = patient_doc["birthdate"].isoformat()
-    if isinstance(patient_doc.get("admission_date"), date):
-        patient_doc["admission_date"] = patient_doc["admission_date"].isoformat()
+    cursor = find_patients(query, [("ward_number", 1), ("id", 1)])
     
-    await db.patients.insert_one(patient_doc)
-    return patient_obj
+    if format == DataFormat.CSV:
+        return StreamingResponse(
+            stream_patients_csv(cursor),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="patients.csv"'}
+        )
+    return StreamingResponse(
+        stream_patients_ndjson(cursor),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="patients.ndjson"'}
+    )
 
-@api_router.get("/patients", response_model=List[Patient])
+@api_router.get("/patients", response_model=Union[List[Patient], List[PatientSummary]])
+@stale_reads_ok
 async def get_patients(
-    search: Optional[str] = Query(None, description="Search by name, patient ID, or ward"),
+    request: Request,
+    search: Optional[str] = Query(
+        None, description='Search by name, patient ID, or ward; each word must start a word of the patient ("joh" finds Johnson, "ohnson" does not)'
+    ),
+    mode: SearchMode = Query(
+        SearchMode.PREFIX, description="prefix matches words by their start; fuzzy by shared trigrams, which also finds misspellings and word fragments"
+    ),
     high_risk: Optional[bool] = Query(None, description="Filter by high risk status"),
     discharged: Optional[bool] = Query(None, description="Filter by discharge status"),
-    ward: Optional[str] = Query(None, description="Filter by ward number")
+    ward: Optional[str] = Query(None, description="Filter by ward number"),
+    age_min: Optional[int] = Query(None, ge=0, le=150, description="Youngest age in years, inclusive"),
+    age_max: Optional[int] = Query(None, ge=0, le=150, description="Oldest age in years, inclusive"),
+    view: View = Query(View.FULL, description="summary for the ward list columns, full for every field"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(1000, ge=1, le=1000, description="Limit number of results")
 ):
-    query = {}
+    # Ages roll over at midnight without any write, so the date is part of the tag
+    etag = await change_etag(("patients",), request.url.query, date.today())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    query = age_range_filter(age_min, age_max)
     
     if search:
-        query["$or"] = [
-            {"full_name": {"$regex": search, "$options": "i"}},
-            {"patient_id": {"$regex": search, "$options": "i"}},
-            {"ward_number": {"$regex": search, "$options": "i"}}
-        ]
+        search_query = search_filter(search, mode)
+        if search_query:
+            query.update(search_query)
     
     if high_risk is not None:
         query["high_risk"] = YesNoEnum.YES if high_risk else YesNoEnum.NO
@@ -190,132 +1403,1122 @@ async def get_patients(
     if ward:
         query["ward_number"] = ward
     
-    patients = await db.patients.find(query).sort("ward_number", 1).to_list(1000)
+    if cursor:
+        last_ward, last_id = decode_cursor(cursor, 2)
+        query = keyset_filter(query, "ward_number", last_ward, last_id)
     
-    # Update ages for all patients
-    updated_patients = []
-    for patient in patients:
-        # Convert string dates back to date objects
-        if isinstance(patient.get("birthdate"), str):
-            try:
-                patient["birthdate"] = datetime.fromisoformat(patient["birthdate"]).date()
-            except:
-                pass
-        if isinstance(patient.get("admission_date"), str):
-            try:
-                patient["admission_date"] = datetime.fromisoformat(patient["admission_date"]).date()
-            except:
-                pass
-        
-        if patient.get("birthdate"):
-            patient["age"] = calculate_age(patient["birthdate"])
-        updated_patients.append(Patient(**patient))
+    fields = PATIENT_VIEWS[view]
+    patients = await find_patients(query, [("ward_number", 1), ("id", 1)], limit + 1, fields).to_list(limit + 1)
+    headers = validator_headers(etag)
+    if len(patients) > limit:
+        patients = patients[:limit]
+        headers["X-Next-Cursor"] = encode_cursor([patients[-1]["ward_number"], patients[-1]["id"]])
     
-    return updated_patients
+    return ORJSONResponse([patient_from_document(patient, fields) for patient in patients], headers=headers)
 
 @api_router.get("/patients/{patient_db_id}", response_model=Patient)
 async def get_patient(patient_db_id: str):
-    patient = await db.patients.find_one({"id": patient_db_id})
-    if not patient:
+    patients = await find_patients({"id": patient_db_id}, [("id", 1)], 1).to_list(1)
+    if not patients:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Convert string dates back to date objects
-    if isinstance(patient.get("birthdate"), str):
-        try:
-            patient["birthdate"] = datetime.fromisoformat(patient["birthdate"]).date()
-        except:
-            pass
-    if isinstance(patient.get("admission_date"), str):
-        try:
-            patient["admission_date"] = datetime.fromisoformat(patient["admission_date"]).date()
-        except:
-            pass
-    
-    # Update age
-    if patient.get("birthdate"):
-        patient["age"] = calculate_age(patient["birthdate"])
-    
-    return Patient(**patient)
+    return ORJSONResponse(patient_from_document(patients[0]))
 
 @api_router.put("/patients/{patient_db_id}", response_model=Patient)
-async def update_patient(patient_db_id: str, patient_update: PatientUpdate):
-    existing_patient = await db.patients.find_one({"id": patient_db_id})
-    if not existing_patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    
-    update_data = {k: v for k, v in patient_update.dict().items() if v is not None}
+async def update_patient(
+    patient_db_id: str,
+    patient_update: PatientUpdate,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    return ORJSONResponse(await with_idempotency(
+        idempotency_key, f"PUT /patients/{patient_db_id}", patient_update,
+        lambda: apply_patient_update(patient_db_id, patient_update)
+    ))
+
+async def apply_patient_update(patient_db_id: str, patient_update: PatientUpdate) -> dict:
+    update_data = patient_to_document({k: v for k, v in patient_update.dict().items() if v is not None})
     update_data["updated_at"] = datetime.utcnow()
+    query = {"id": patient_db_id}
+    projection = {**PATIENT_PROJECTION, "meta_version": 1}
+    existing_patient = None
+    censused = False
+    changed = set()
     
-    # Convert date objects to strings for MongoDB
-    if isinstance(update_data.get("birthdate"), date):
-        update_data["birthdate"] = update_data["birthdate"].isoformat()
-    if isinstance(update_data.get("admission_date"), date):
-        update_data["admission_date"] = update_data["admission_date"].isoformat()
-    
-    # Recalculate age if birthdate is updated
-    if "birthdate" in update_data:
-        birthdate_obj = datetime.fromisoformat(update_data["birthdate"]).date() if isinstance(update_data["birthdate"], str) else update_data["birthdate"]
-        update_data["age"] = calculate_age(birthdate_obj)
-    elif existing_patient.get("birthdate"):
-        existing_birthdate = existing_patient["birthdate"]
-        if isinstance(existing_birthdate, str):
-            existing_birthdate = datetime.fromisoformat(existing_birthdate).date()
-        update_data["age"] = calculate_age(existing_birthdate)
+    # Search fields are derived from all of SEARCH_FIELDS and the census entry
+    # from all of CENSUS_FIELDS. The edit form submits only the fields it
+    # changed, so an edit naming any of them reads the stored values first;
+    # other edits are a single round-trip
+    derived = [field for field in dict.fromkeys((*SEARCH_FIELDS, *CENSUS_FIELDS)) if field in update_data]
+    if derived:
+        stored_projection = {"_id": 0, "id": 1, **{field: 1 for field in (*SEARCH_FIELDS, *CENSUS_FIELDS)}}
+        existing_patient = await db.patients.find_one(query, stored_projection)
+        if not existing_patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        # Other clients may still resubmit values they did not change
+        changed = {field for field in derived if update_data[field] != existing_patient.get(field)}
+        if changed.intersection(SEARCH_FIELDS):
+            update_data.update(build_search_fields({**existing_patient, **update_data}))
+        # The update only applies if the stored values it keeps still match:
+        # a concurrent change to one must not be silently reverted without its propagation
+        query.update((field, value) for field, value in existing_patient.items() if field not in changed)
+        censused = bool(changed.intersection(CENSUS_FIELDS))
+        if censused:
+            # Taken before the patient is written, so a double assignment changes nothing
+            await assign_bed({**existing_patient, **update_data})
     
-    await db.patients.update_one({"id": patient_db_id}, {"$set": update_data})
+    update = {"$set": update_data}
+    copied = [field for field in VITAL_SIGNS_PATIENT_FIELDS.values() if field in changed]
+    if copied:
+        update["$inc"] = {"meta_version": 1}
+    updated_patient = await db.patients.find_one_and_update(
+        query, update, projection=projection, return_document=ReturnDocument.AFTER
+    )
+    if not updated_patient:
+        if censused:
+            await resync_census_entry(patient_db_id)
+        if existing_patient:
+            raise HTTPException(status_code=409, detail="Patient was changed by another request, please retry")
+        raise HTTPException(status_code=404, detail="Patient not found")
+    meta_version = updated_patient.pop("meta_version", 0)
+    updated_patient = patient_from_document(updated_patient)
+    patient_cache.invalidate(patient_db_id)
+    await record_change("patients")
     
-    updated_patient = await db.patients.find_one({"id": patient_db_id})
+    if updated_patient["discharged"] == YesNoEnum.YES:
+        await db.early_warning_scores.delete_one({"_id": patient_db_id})
     
-    # Convert string dates back to date objects
-    if isinstance(updated_patient.get("birthdate"), str):
-        try:
-            updated_patient["birthdate"] = datetime.fromisoformat(updated_patient["birthdate"]).date()
-        except:
-            pass
-    if isinstance(updated_patient.get("admission_date"), str):
+    previous_ward = (existing_patient or updated_patient)["ward_number"]
+    if copied:
+        moved_from = [previous_ward] if previous_ward != updated_patient["ward_number"] else []
+        await schedule_vitals_propagation(patient_db_id, meta_version, moved_from)
+    event_bus.publish("patient.updated", [previous_ward, updated_patient["ward_number"]], updated_patient)
+    return updated_patient
+
+# Patient jobs: resumable background work on a patient's vital signs, one
+# document per patient in a job collection, claimed with a lease
+def job_lease() -> dict:
+    return {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=PATIENT_JOB_LEASE_SECONDS)}}
+
+async def claim_job(collection, patient_db_id: str) -> Optional[dict]:
+    """Take a job's lease, or return None while another worker holds it."""
+    return await collection.find_one_and_update(
+        {"_id": patient_db_id, "lease_until": {"$lte": datetime.utcnow()}}, job_lease()
+    )
+
+# Background jobs started by this worker, referenced so they are not garbage collected
+background_jobs = set()
+
+def start_background_job(job, patient_db_id: str):
+    async def run():
         try:
-            updated_patient["admission_date"] = datetime.fromisoformat(updated_patient["admission_date"]).date()
-        except:
-            pass
+            await job(patient_db_id)
+        except Exception:
+            logger.exception("%s for patient %s failed; it resumes when its lease expires", job.__name__, patient_db_id)
+    task = asyncio.create_task(run())
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+
+def ward_rollup_buckets(readings) -> set:
+    return {bucket for reading in readings for bucket in rollup_buckets(reading, scopes=("ward",))}
+
+# Propagation of a patient's name, ward and bed to the copies on their vital
+# signs. Each change bumps the patient's meta_version; vitals_meta_version
+# records the version the vital signs last caught up with
+VITAL_SIGNS_PATIENT_FIELDS = {"patient_name": "full_name", "ward_number": "ward_number", "bed_number": "bed_number"}
+
+async def schedule_vitals_propagation(patient_db_id: str, meta_version: int, moved_from: List[str]):
+    """Queue a propagation job for the patient, noting wards whose rollups lose readings."""
+    now = datetime.utcnow()
+    await db.vitals_propagations.update_one(
+        {"_id": patient_db_id},
+        {
+            "$max": {"meta_version": meta_version},
+            "$addToSet": {"moved_from": {"$each": moved_from}},
+            "$setOnInsert": {"created_at": now, "lease_until": now},
+        },
+        upsert=True
+    )
+    start_background_job(run_vitals_propagation, patient_db_id)
+
+async def refresh_moved_rollups(patient_db_id: str, wards: set):
+    """Recompute the wards' rollup buckets covering the patient's readings."""
+    buckets = set()
+    async for reading in vitals_store.iter_readings({"patient_id": patient_db_id}):
+        buckets.update((granularity, bucket_start(reading["monitoring_datetime"], granularity)) for granularity in Granularity)
+    for ward in wards:
+        for granularity, start in buckets:
+            await recompute_rollup_bucket("ward", ward, granularity, start)
+
+async def run_vitals_propagation(patient_db_id: str) -> bool:
+    """Rewrite the patient's copies on their vital signs in rate-limited batches.
+
+    Returns False if another worker holds the job. The copies are compared
+    with the patient's current values rather than a snapshot, so the job is
+    idempotent, and it keeps going until no newer update has been queued.
+    """
+    job = await claim_job(db.vitals_propagations, patient_db_id)
+    if not job:
+        return False
+    
+    projection = {"_id": 0, "meta_version": 1, **{field: 1 for field in VITAL_SIGNS_PATIENT_FIELDS.values()}}
+    while True:
+        patient = await db.patients.find_one({"id": patient_db_id}, projection)
+        if not patient:
+            # Deleted meanwhile; its purge removes the vital signs and their rollups
+            await db.vitals_propagations.delete_one({"_id": patient_db_id})
+            return True
+        meta = {field: patient[source] for field, source in VITAL_SIGNS_PATIENT_FIELDS.items()}
+        await db.early_warning_scores.update_one({"_id": patient_db_id}, {"$set": meta})
+        while await vitals_store.propagate_patient(patient_db_id, meta, VITALS_PROPAGATION_BATCH_SIZE):
+            await db.vitals_propagations.update_one({"_id": patient_db_id}, job_lease())
+            await asyncio.sleep(VITALS_PROPAGATION_BATCH_DELAY)
+        
+        job = await db.vitals_propagations.find_one({"_id": patient_db_id})
+        if job.get("moved_from"):
+            await refresh_moved_rollups(patient_db_id, {*job["moved_from"], meta["ward_number"]})
+        meta_version = patient.get("meta_version", 0)
+        await db.patients.update_one({"id": patient_db_id}, {"$max": {"vitals_meta_version": meta_version}})
+        # Every update that needs propagating bumps meta_version, so a newer one keeps the job
+        finished = await db.vitals_propagations.delete_one({"_id": patient_db_id, "meta_version": {"$lte": meta_version}})
+        if finished.deleted_count:
+            break
+    await record_change("vital_signs")
+    return True
+
+# Patient deletion: small histories in one transaction, large ones by a purge job
+def supports_transactions() -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster."""
+    return client.topology_description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+async def delete_patient_in_transaction(patient_db_id: str) -> tuple:
+    """Delete a patient with its vital signs, patient rollups and tombstone atomically.
+
+    Returns the deleted patient (None if there was none) and its readings'
+    rollup keys, so the ward rollups can be refreshed after the commit.
+    """
+    async def delete(session):
+        deleted = await db.patients.find_one_and_delete(
+            {"id": patient_db_id}, projection={"_id": 0, "ward_number": 1}, session=session
+        )
+        if not deleted:
+            return None, []
+        await db.ward_census.delete_one({"_id": patient_db_id}, session=session)
+        await db.early_warning_scores.delete_one({"_id": patient_db_id}, session=session)
+        document_ids, readings = await vitals_store.find_patient_batch(patient_db_id, session=session)
+        await vitals_store.delete_documents(document_ids, session=session)
+        await db.vital_signs_rollups.delete_many({"scope": "patient", "key": patient_db_id}, session=session)
+        await record_tombstone("patient", patient_db_id, session=session)
+        return deleted, readings
+    
+    async with await client.start_session() as session:
+        return await session.with_transaction(delete)
+
+async def run_patient_purge(patient_db_id: str) -> bool:
+    """Delete a deleted patient's vital signs in batches, then refresh the rollups.
+
+    Returns False if another worker holds the job. Affected ward buckets are
+    recorded on the job before each batch is deleted, so a job resumed after
+    a crash still refreshes them.
+    """
+    job = await claim_job(db.patient_purges, patient_db_id)
+    if not job:
+        return False
     
-    return Patient(**updated_patient)
+    while True:
+        document_ids, readings = await vitals_store.find_patient_batch(patient_db_id, PATIENT_PURGE_BATCH_SIZE)
+        if not document_ids:
+            break
+        buckets = [
+            {"key": key, "granularity": granularity.value, "bucket_start": start}
+            for _, key, granularity, start in ward_rollup_buckets(readings)
+        ]
+        await db.patient_purges.update_one(
+            {"_id": patient_db_id}, {**job_lease(), "$addToSet": {"ward_buckets": {"$each": buckets}}}
+        )
+        await vitals_store.delete_documents(document_ids)
+    
+    await db.vital_signs_rollups.delete_many({"scope": "patient", "key": patient_db_id})
+    job = await db.patient_purges.find_one({"_id": patient_db_id}, {"ward_buckets": 1})
+    for bucket in job.get("ward_buckets", []):
+        await recompute_rollup_bucket("ward", bucket["key"], Granularity(bucket["granularity"]), bucket["bucket_start"])
+    await db.patient_purges.delete_one({"_id": patient_db_id})
+    await db.vitals_propagations.delete_one({"_id": patient_db_id})
+    await record_change("vital_signs")
+    return True
+
+PATIENT_JOBS = {"patient_purges": run_patient_purge, "vitals_propagations": run_vitals_propagation}
+
+async def resume_patient_jobs() -> dict:
+    """Finish purges and propagations whose worker stopped before completing them."""
+    resumed = {}
+    for collection, job in PATIENT_JOBS.items():
+        resumed[collection] = 0
+        async for pending in db[collection].find({"lease_until": {"$lte": datetime.utcnow()}}, {"_id": 1}):
+            try:
+                resumed[collection] += await job(pending["_id"])
+            except PyMongoError:
+                logger.exception("%s for patient %s failed; it resumes when its lease expires", job.__name__, pending["_id"])
+    if any(resumed.values()):
+        logger.info("Resumed patient jobs: %s", resumed)
+    return resumed
 
 @api_router.delete("/patients/{patient_db_id}")
 async def delete_patient(patient_db_id: str):
-    result = await db.patients.delete_one({"id": patient_db_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Patient not found")
+    stored = await vitals_store.count_patient(patient_db_id, PATIENT_PURGE_INLINE_DOCUMENTS + 1)
+    large = stored > PATIENT_PURGE_INLINE_DOCUMENTS
+    
+    if not large and supports_transactions():
+        deleted, readings = await delete_patient_in_transaction(patient_db_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        for bucket in ward_rollup_buckets(readings):
+            await recompute_rollup_bucket(*bucket)
+    else:
+        deleted = await db.patients.find_one_and_delete({"id": patient_db_id}, projection={"_id": 0, "ward_number": 1})
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        await db.ward_census.delete_one({"_id": patient_db_id})
+        await db.early_warning_scores.delete_one({"_id": patient_db_id})
+        await db.patient_purges.insert_one({
+            "_id": patient_db_id, "ward_buckets": [], "created_at": datetime.utcnow(), "lease_until": datetime.utcnow()
+        })
+        await record_tombstone("patient", patient_db_id)
+        if large:
+            start_background_job(run_patient_purge, patient_db_id)
+        else:
+            await run_patient_purge(patient_db_id)
     
-    # Also delete associated vital signs
-    await db.vital_signs.delete_many({"patient_id": patient_db_id})
+    patient_cache.invalidate(patient_db_id)
+    await record_change("patients", "vital_signs")
+    event_bus.publish("patient.deleted", [deleted.get("ward_number")], {"id": patient_db_id})
     
     return {"message": "Patient deleted successfully"}
 
 
+# Vital Signs helpers
+# Maternal early-warning score (MEOWS-style): each parameter is checked
+# against [low, high) bands, None meaning unbounded; a reading in a red band
+# scores 2 and in a yellow band 1, values outside every band are normal
+MEOWS_BANDS = {
+    "temperature": [(TriggerLevel.RED, None, 35), (TriggerLevel.YELLOW, 35, 36), (TriggerLevel.RED, 38, None)],
+    "systolic_bp": [
+        (TriggerLevel.RED, None, 90), (TriggerLevel.YELLOW, 90, 100),
+        (TriggerLevel.YELLOW, 150, 160), (TriggerLevel.RED, 160, None),
+    ],
+    "diastolic_bp": [(TriggerLevel.YELLOW, 90, 100), (TriggerLevel.RED, 100, None)],
+    "heart_rate": [
+        (TriggerLevel.RED, None, 40), (TriggerLevel.YELLOW, 40, 50),
+        (TriggerLevel.YELLOW, 100, 120), (TriggerLevel.RED, 120, None),
+    ],
+    "respiratory_rate": [(TriggerLevel.RED, None, 10), (TriggerLevel.YELLOW, 21, 30), (TriggerLevel.RED, 30, None)],
+    "spo2": [(TriggerLevel.RED, None, 95)],
+}
+TRIGGER_POINTS = {TriggerLevel.YELLOW: 1, TriggerLevel.RED: 2}
+BLOOD_PRESSURE_PATTERN = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$")
+
+def parse_blood_pressure(value: Optional[str]) -> tuple:
+    """(systolic, diastolic) from a reading such as "120/80", or (None, None) if it does not parse."""
+    match = BLOOD_PRESSURE_PATTERN.match(value or "")
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+def early_warning_triggers(reading: dict) -> dict:
+    triggers = {}
+    for parameter, bands in MEOWS_BANDS.items():
+        value = reading.get(parameter)
+        if value is None:
+            continue
+        for level, low, high in bands:
+            if (low is None or value >= low) and (high is None or value < high):
+                triggers[parameter] = level
+                break
+    return triggers
+
+def score_reading(reading: dict) -> dict:
+    """Fill in a reading's parsed blood pressure, MEOWS triggers and score; returns the reading."""
+    reading["systolic_bp"], reading["diastolic_bp"] = parse_blood_pressure(reading.get("blood_pressure"))
+    reading["ews_triggers"] = early_warning_triggers(reading)
+    reading["ews_score"] = sum(TRIGGER_POINTS[level] for level in reading["ews_triggers"].values())
+    return reading
+
+def build_vital_signs(vital_signs: VitalSignsCreate, patient: dict) -> VitalSigns:
+    """Create a scored reading with the patient's name, ward and bed filled in."""
+    vital_signs_dict = vital_signs.dict()
+    vital_signs_dict["patient_name"] = patient["full_name"]
+    vital_signs_dict["ward_number"] = patient["ward_number"]
+    vital_signs_dict["bed_number"] = patient["bed_number"]
+    vital_signs_dict["created_at"] = vital_signs_dict["updated_at"] = datetime.utcnow()
+    return VitalSigns(**score_reading(vital_signs_dict))
+
+# Latest early-warning score per patient, so alerts are one indexed read
+def latest_score(reading: dict) -> dict:
+    return {
+        "patient_id": reading["patient_id"],
+        "patient_name": reading["patient_name"],
+        "ward_number": reading["ward_number"],
+        "bed_number": reading["bed_number"],
+        "vital_signs_id": reading["id"],
+        "monitoring_datetime": utc_naive(reading["monitoring_datetime"]),
+        "ews_score": reading["ews_score"],
+        "ews_triggers": reading["ews_triggers"],
+    }
+
+async def record_latest_scores(readings: List[dict]):
+    """Move each patient's early_warning_scores document to their newest reading, if newer than it.
+
+    Discharged patients are skipped, as in rebuild_early_warning_scores, so a
+    late reading does not put them back on the alerts list.
+    """
+    discharged = await discharged_patient_ids({reading["patient_id"] for reading in readings})
+    newest = {}
+    for reading in readings:
+        if reading["patient_id"] in discharged:
+            continue
+        key = (utc_naive(reading["monitoring_datetime"]), reading["id"])
+        if reading["patient_id"] not in newest or key > newest[reading["patient_id"]][0]:
+            newest[reading["patient_id"]] = (key, reading)
+    operations = [
+        UpdateOne(
+            {"_id": patient_id, "monitoring_datetime": {"$lte": key[0]}}, {"$set": latest_score(reading)}, upsert=True
+        )
+        for patient_id, (key, reading) in newest.items()
+    ]
+    # A filter miss on an existing document means it already holds a newer
+    # reading and the upsert fails on _id; those are retried once in case
+    # the document was only just created by a concurrent insert
+    for attempt in range(2):
+        if not operations:
+            return
+        try:
+            await db.early_warning_scores.bulk_write(operations, ordered=False)
+            return
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in write_errors):
+                raise
+            operations = [operations[error["index"]] for error in write_errors]
+
+async def discharged_patient_ids(patient_ids) -> set:
+    query = {"id": {"$in": list(patient_ids)}, "discharged": YesNoEnum.YES}
+    return {patient["id"] async for patient in db.patients.find(query, {"_id": 0, "id": 1})}
+
+async def refresh_latest_score(patient_db_id: str):
+    """Point the patient's latest score at their newest remaining reading, scoring it if it predates scoring."""
+    newest = await vitals_store.find_page({"patient_id": patient_db_id}, None, 1)
+    if not newest or await discharged_patient_ids([patient_db_id]):
+        await db.early_warning_scores.delete_one({"_id": patient_db_id})
+        return
+    reading = newest[0] if newest[0].get("ews_score") is not None else score_reading(newest[0])
+    await db.early_warning_scores.replace_one({"_id": patient_db_id}, latest_score(reading), upsert=True)
+
+async def rebuild_early_warning_scores() -> int:
+    """Recreate the latest score of every admitted patient from their newest reading; returns how many."""
+    await db.early_warning_scores.delete_many({})
+    scored = 0
+    async for patient in db.patients.find({"discharged": {"$ne": YesNoEnum.YES}}, {"_id": 0, "id": 1}):
+        await refresh_latest_score(patient["id"])
+        scored += 1
+    return scored
+
+async def iter_bulk_items(request: Request):
+    """Yield the items of a JSON array or CSV body, or the raw lines of an NDJSON stream."""
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        # Quoted CSV fields may span lines, so spool the upload (to disk past 8 MB)
+        # and let the csv module read it back row by row
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            spool.seek(0)
+            for row in csv.DictReader(line.decode("utf-8-sig") for line in spool):
+                yield {key: value for key, value in row.items() if key and value != ""}
+        return
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or an NDJSON stream")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or an NDJSON stream")
+    for item in items:
+        yield item
+
+async def insert_vital_signs_batch(batch: list, result: BulkIngestResult):
+    """Resolve the batch's patients (cache, then one $in query) and insert it unordered."""
+    patients = await get_patient_summaries(vital_signs.patient_id for _, vital_signs in batch)
+    
+    indexes = []
+    documents = []
+    for index, vital_signs in batch:
+        patient = patients.get(vital_signs.patient_id)
+        if not patient:
+            result.errors.append(BulkItemError(index=index, detail="Patient not found"))
+            continue
+        indexes.append(index)
+        documents.append(build_vital_signs(vital_signs, patient).dict())
+    if not documents:
+        return
+    
+    failures = await vitals_store.insert_many(documents)
+    result.inserted += len(documents) - len(failures)
+    for position, message in failures:
+        result.errors.append(BulkItemError(index=indexes[position], detail=message))
+    failed = {position for position, _ in failures}
+    inserted = [document for position, document in enumerate(documents) if position not in failed]
+    await apply_rollup_updates(rollup_updates(inserted))
+    await record_latest_scores(inserted)
+    for document in inserted:
+        event_bus.publish("vital_signs.created", [document["ward_number"]], document)
+
+
+# Vital signs rollups: per patient and per ward, hourly and daily (UTC) buckets
+ROLLUP_METRICS = ("heart_rate", "temperature", "spo2", "pain_score")
+ROLLUP_TOTALS = ("urine_output", "iv_fluids_volume")
+ROLLUP_SCOPES = {"patient": "patient_id", "ward": "ward_number"}
+
+def bucket_start(moment: datetime, granularity: Granularity) -> datetime:
+    moment = utc_naive(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == Granularity.DAY else moment
+
+def bucket_end(start: datetime, granularity: Granularity) -> datetime:
+    return start + (timedelta(days=1) if granularity == Granularity.DAY else timedelta(hours=1))
+
+def rollup_filter(scope: str, key: str, granularity: Granularity, start: datetime) -> dict:
+    return {"scope": scope, "key": key, "granularity": Granularity(granularity).value, "bucket_start": start}
+
+def rollup_buckets(reading: dict, scopes=tuple(ROLLUP_SCOPES)):
+    """Yield the (scope, key, granularity, bucket_start) of every bucket a reading falls in."""
+    for scope in scopes:
+        for granularity in Granularity:
+            yield scope, reading[ROLLUP_SCOPES[scope]], granularity, bucket_start(reading["monitoring_datetime"], granularity)
+
+def rollup_updates(readings) -> List[UpdateOne]:
+    """Merge readings into one upsert per affected bucket."""
+    buckets = {}
+    for reading in readings:
+        for bucket in rollup_buckets(reading):
+            update = buckets.setdefault(bucket, {"$inc": {"count": 0}, "$min": {}, "$max": {}})
+            update["$inc"]["count"] += 1
+            for metric in ROLLUP_METRICS:
+                value = reading.get(metric)
+                if value is None:
+                    continue
+                update["$inc"][f"{metric}.sum"] = update["$inc"].get(f"{metric}.sum", 0) + value
+                update["$min"][f"{metric}.min"] = min(update["$min"].get(f"{metric}.min", value), value)
+                update["$max"][f"{metric}.max"] = max(update["$max"].get(f"{metric}.max", value), value)
+            for total in ROLLUP_TOTALS:
+                update["$inc"][f"{total}_total"] = update["$inc"].get(f"{total}_total", 0) + (reading.get(total) or 0)
+    return [
+        UpdateOne(rollup_filter(*bucket), {op: fields for op, fields in update.items() if fields}, upsert=True)
+        for bucket, update in buckets.items()
+    ]
+
+async def apply_rollup_updates(operations: List[UpdateOne]):
+    await bulk_upsert(db.vital_signs_rollups, operations)
+
+async def recompute_rollup_bucket(scope: str, key: str, granularity: Granularity, start: datetime):
+    """Rebuild one bucket from raw readings; used when readings are removed."""
+    values = await vitals_store.summarize(
+        {ROLLUP_SCOPES[scope]: key}, start, bucket_end(start, granularity), ROLLUP_METRICS, ROLLUP_TOTALS
+    )
+    
+    bucket_filter = rollup_filter(scope, key, granularity, start)
+    if not values:
+        await db.vital_signs_rollups.delete_one(bucket_filter)
+        return
+    bucket = {**bucket_filter, "count": values["count"]}
+    for metric in ROLLUP_METRICS:
+        bucket[metric] = {"sum": values[f"{metric}_sum"], "min": values[f"{metric}_min"], "max": values[f"{metric}_max"]}
+    for total in ROLLUP_TOTALS:
+        bucket[f"{total}_total"] = values[f"{total}_total"]
+    await db.vital_signs_rollups.replace_one(bucket_filter, bucket, upsert=True)
+
+async def rebuild_rollups(batch_size: int = 5000) -> int:
+    """Recompute every rollup bucket from the raw readings.
+
+    Meant for backfills and repairs while ingestion is paused; readings written
+    during a rebuild may be counted twice.
+    """
+    await db.vital_signs_rollups.delete_many({})
+    readings = 0
+    batch = []
+    async for reading in vitals_store.iter_readings({}):
+        batch.append(reading)
+        if len(batch) >= batch_size:
+            await apply_rollup_updates(rollup_updates(batch))
+            readings += len(batch)
+            batch = []
+    await apply_rollup_updates(rollup_updates(batch))
+    return readings + len(batch)
+
+def rollup_response(bucket: dict) -> VitalSignsRollup:
+    summaries = {}
+    for metric in ROLLUP_METRICS:
+        values = bucket.get(metric) or {}
+        mean = values["sum"] / bucket["count"] if values.get("sum") is not None and bucket["count"] else None
+        summaries[metric] = MetricSummary(min=values.get("min"), max=values.get("max"), mean=mean)
+    return VitalSignsRollup(
+        scope=bucket["scope"],
+        key=bucket["key"],
+        granularity=bucket["granularity"],
+        bucket_start=bucket["bucket_start"],
+        count=bucket["count"],
+        urine_output_total=bucket.get("urine_output_total", 0),
+        iv_fluids_volume_total=bucket.get("iv_fluids_volume_total", 0),
+        **summaries
+    )
+
+
+# Vital signs storage
+VITAL_SIGNS_META_FIELDS = ("patient_id", "patient_name", "ward_number", "bed_number")
+# Buckets keep a single updated_at, their last write, for all their readings
+VITAL_SIGNS_COLUMNS = [field for field in VitalSigns.model_fields if field not in (*VITAL_SIGNS_META_FIELDS, "updated_at")]
+VITAL_SIGNS_VIEWS = {View.SUMMARY: list(VitalSignsSummary.model_fields), View.FULL: list(VitalSigns.model_fields)}
+
+def time_range_filter(start: Optional[datetime], end: Optional[datetime]) -> dict:
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return bounds
+
+class DocumentVitalSignsStore:
+    """One document per reading in the vital_signs collection."""
+
+    collection_name = "vital_signs"
+    indexes = [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("patient_id", ASCENDING), ("monitoring_datetime", DESCENDING), ("id", DESCENDING)], name="patient_id_monitoring_datetime_id"),
+        IndexModel([("ward_number", ASCENDING), ("monitoring_datetime", DESCENDING), ("id", DESCENDING)], name="ward_number_monitoring_datetime_id"),
+        IndexModel([("monitoring_datetime", DESCENDING), ("id", DESCENDING)], name="monitoring_datetime_id"),
+        IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+    ]
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    @property
+    def read_collection(self):
+        return read_db()[self.collection_name]
+
+    async def ensure_columns(self):
+        """Readings are whole documents; only updated_at, which replicas sync by, is backfilled."""
+        await self.collection.update_many({"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}])
+
+    async def insert_many(self, documents: List[dict]) -> List[tuple]:
+        """Insert readings unordered and return (position, message) for each that failed."""
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            return [(error["index"], error["errmsg"]) for error in e.details.get("writeErrors", [])]
+        return []
+
+    async def find_page(self, query: dict, after: Optional[tuple], limit: int, fields: Optional[List[str]] = None) -> List[dict]:
+        """Return up to limit readings newest first, after the (monitoring_datetime, id) key.
+
+        fields limits each reading to those fields; the page key fields are always included.
+        """
+        if after:
+            query = keyset_filter(query, "monitoring_datetime", after[0], after[1], descending=True)
+        projection = {"_id": 0}
+        if fields:
+            projection.update({field: 1 for field in ("id", "monitoring_datetime", *fields)})
+        cursor = self.read_collection.find(query, projection).sort([("monitoring_datetime", -1), ("id", -1)])
+        return await cursor.limit(limit).to_list(limit)
+
+    async def find_sync_page(self, after: Optional[tuple], limit: int) -> tuple:
+        """Return (readings, last key, has_more) for up to limit readings oldest write first, after the (updated_at, id) key."""
+        query = keyset_filter({}, "updated_at", after[0], after[1]) if after else {}
+        cursor = self.collection.find(query, {"_id": 0}).sort([("updated_at", 1), ("id", 1)])
+        readings = await cursor.limit(limit + 1).to_list(limit + 1)
+        has_more = len(readings) > limit
+        readings = readings[:limit]
+        return readings, (readings[-1]["updated_at"], readings[-1]["id"]) if readings else after, has_more
+
+    async def find_one(self, vital_signs_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": vital_signs_id}, {"_id": 0})
+
+    async def delete_one(self, vital_signs_id: str) -> Optional[dict]:
+        return await self.collection.find_one_and_delete({"id": vital_signs_id}, projection={"_id": 0})
+
+    async def count_patient(self, patient_id: str, limit: int) -> int:
+        """Stored documents of a patient, counting no further than limit."""
+        return await self.collection.count_documents({"patient_id": patient_id}, limit=limit)
+
+    async def find_patient_batch(self, patient_id: str, limit: int = 0, session=None) -> tuple:
+        """Return (document ids, readings) for up to limit stored documents of a patient, all if 0.
+
+        The readings only carry the fields rollup_buckets needs.
+        """
+        projection = {"_id": 1, "patient_id": 1, "ward_number": 1, "monitoring_datetime": 1}
+        readings = await self.collection.find({"patient_id": patient_id}, projection, session=session).limit(limit).to_list(None)
+        return [reading.pop("_id") for reading in readings], readings
+
+    async def delete_documents(self, document_ids: list, session=None):
+        await self.collection.delete_many({"_id": {"$in": document_ids}}, session=session)
+
+    async def propagate_patient(self, patient_id: str, meta: dict, limit: int) -> int:
+        """Copy meta onto up to limit readings of the patient whose copies differ; returns how many."""
+        stale = {"patient_id": patient_id, "$or": [{field: {"$ne": value}} for field, value in meta.items()]}
+        document_ids = [document["_id"] async for document in self.collection.find(stale, {"_id": 1}).limit(limit)]
+        if document_ids:
+            await self.collection.update_many({"_id": {"$in": document_ids}}, {"$set": {**meta, "updated_at": datetime.utcnow()}})
+        return len(document_ids)
+
+    async def iter_readings(self, query: dict, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        query = dict(query)
+        if start or end:
+            query["monitoring_datetime"] = time_range_filter(start, end)
+        async for reading in self.collection.find(query, {"_id": 0}).batch_size(1000):
+            yield reading
+
+    async def find_columns(self, query: dict, start: datetime, end: datetime, fields) -> Dict[str, list]:
+        """The given fields of readings in [start, end) as {field: values}, in no particular order."""
+        match = {**query, "monitoring_datetime": time_range_filter(start, end)}
+        columns = {field: [] for field in fields}
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        async for reading in self.read_collection.find(match, projection).batch_size(5000):
+            for field, values in columns.items():
+                values.append(reading.get(field))
+        return columns
+
+    async def summarize(self, query: dict, start: datetime, end: datetime, metrics, totals) -> Optional[dict]:
+        """Count, sum, min and max of metrics and sum of totals over a time range."""
+        group = {"_id": None, "count": {"$sum": 1}}
+        for metric in metrics:
+            group[f"{metric}_sum"] = {"$sum": f"${metric}"}
+            group[f"{metric}_min"] = {"$min": f"${metric}"}
+            group[f"{metric}_max"] = {"$max": f"${metric}"}
+        for total in totals:
+            group[f"{total}_total"] = {"$sum": f"${total}"}
+        match = {**query, "monitoring_datetime": time_range_filter(start, end)}
+        aggregated = await self.collection.aggregate([{"$match": match}, {"$group": group}]).to_list(1)
+        if not aggregated or not aggregated[0]["count"]:
+            return None
+        return aggregated[0]
+
+    async def count(self) -> int:
+        return await self.read_collection.estimated_document_count()
+
+class BucketedVitalSignsStore:
+    """Readings packed into one document per patient, ward, bed and time window.
+
+    Each bucket stores the patient fields once and every other reading field
+    as a column array, so readings i of a bucket is columns[field][i].
+    """
+
+    collection_name = "vital_signs_buckets"
+    bucket_key_fields = ("patient_id", "ward_number", "bed_number")
+    indexes = [
+        IndexModel(
+            [("patient_id", ASCENDING), ("bucket_start", DESCENDING), ("ward_number", ASCENDING), ("bed_number", ASCENDING)],
+            name="patient_id_bucket_start_ward_number_bed_number_unique", unique=True
+        ),
+        IndexModel([("ward_number", ASCENDING), ("bucket_start", DESCENDING)], name="ward_number_bucket_start"),
+        IndexModel([("bucket_start", DESCENDING)], name="bucket_start"),
+        IndexModel([("columns.id", ASCENDING)], name="columns_id"),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+    ]
+
+    def __init__(self, bucket_hours: int = VITALS_BUCKET_HOURS):
+        self.span = timedelta(hours=bucket_hours)
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    @property
+    def read_collection(self):
+        return read_db()[self.collection_name]
+
+    async def ensure_columns(self):
+        """Pad buckets written before a column existed with nulls, so every column stays aligned with id."""
+        padding = {"$map": {"input": "$columns.id", "in": None}}
+        await self.collection.update_many(
+            {"$or": [{f"columns.{field}": {"$exists": False}} for field in VITAL_SIGNS_COLUMNS]},
+            [{"$set": {f"columns.{field}": {"$ifNull": [f"$columns.{field}", padding]} for field in VITAL_SIGNS_COLUMNS}}]
+        )
+
+    def bucket_start(self, moment: datetime) -> datetime:
+        moment = utc_naive(moment)
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day + ((moment - day) // self.span) * self.span
+
+    def row(self, bucket: dict, position: int) -> dict:
+        reading = {field: bucket[field] for field in VITAL_SIGNS_META_FIELDS}
+        reading.update((field, values[position]) for field, values in bucket["columns"].items())
+        if "updated_at" in bucket:
+            reading["updated_at"] = bucket["updated_at"]
+        return reading
+
+    def rows(self, bucket: dict) -> List[dict]:
+        return [self.row(bucket, position) for position in range(len(bucket["columns"]["id"]))]
+
+    async def insert_many(self, documents: List[dict]) -> List[tuple]:
+        buckets = {}
+        for document in documents:
+            key = tuple(document[field] for field in self.bucket_key_fields)
+            key += (self.bucket_start(document["monitoring_datetime"]),)
+            bucket = buckets.setdefault(key, {"patient_name": None, "columns": {field: [] for field in VITAL_SIGNS_COLUMNS}})
+            bucket["patient_name"] = document["patient_name"]
+            for field in VITAL_SIGNS_COLUMNS:
+                bucket["columns"][field].append(document.get(field))
+        # updated_at is the bucket's last write, the key replicas sync buckets by
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {**dict(zip(self.bucket_key_fields, key)), "bucket_start": key[-1]},
+                {
+                    "$push": {f"columns.{field}": {"$each": values} for field, values in bucket["columns"].items()},
+                    "$inc": {"count": len(bucket["columns"]["id"])},
+                    "$set": {"patient_name": bucket["patient_name"], "updated_at": now},
+                },
+                upsert=True
+            )
+            for key, bucket in buckets.items()
+        ]
+        await bulk_upsert(self.collection, operations)
+        return []
+
+    def _newest_first(self, buckets: List[dict], after: Optional[tuple]) -> List[dict]:
+        readings = [reading for bucket in buckets for reading in self.rows(bucket)]
+        if after:
+            readings = [reading for reading in readings if (reading["monitoring_datetime"], reading["id"]) < after]
+        readings.sort(key=lambda reading: (reading["monitoring_datetime"], reading["id"]), reverse=True)
+        return readings
+
+    async def find_page(self, query: dict, after: Optional[tuple], limit: int, fields: Optional[List[str]] = None) -> List[dict]:
+        bucket_query = dict(query)
+        if after:
+            bucket_query["bucket_start"] = {"$lte": after[0]}
+        projection = None
+        if fields:
+            columns = [field for field in VITAL_SIGNS_COLUMNS if field in ("id", "monitoring_datetime", *fields)]
+            projection = {"bucket_start": 1, **{field: 1 for field in VITAL_SIGNS_META_FIELDS}}
+            projection.update({f"columns.{field}": 1 for field in columns})
+            if "updated_at" in fields:
+                projection["updated_at"] = 1
+        # Buckets with the same start can interleave (several patients on a ward),
+        # but every reading in an older bucket is older than any in a newer one
+        readings = []
+        group = []
+        async for bucket in self.read_collection.find(bucket_query, projection).sort("bucket_start", -1):
+            if group and bucket["bucket_start"] != group[0]["bucket_start"]:
+                readings.extend(self._newest_first(group, after))
+                group = []
+                if len(readings) >= limit:
+                    break
+            group.append(bucket)
+        readings.extend(self._newest_first(group, after))
+        return readings[:limit]
+
+    async def find_sync_page(self, after: Optional[tuple], limit: int) -> tuple:
+        """Return (readings, last key, has_more) for whole buckets written after the (updated_at, bucket id) key.
+
+        A late reading lands in an old bucket, so created_at cannot page
+        across buckets; buckets are read in write order instead until limit
+        readings are collected, so a page can run over by one bucket.
+        """
+        query = {}
+        if after and ObjectId.is_valid(after[1]):
+            query = {"$or": [{"updated_at": {"$gt": after[0]}}, {"updated_at": after[0], "_id": {"$gt": ObjectId(after[1])}}]}
+        elif after:
+            query = {"updated_at": {"$gte": after[0]}}
+        readings = []
+        key = after
+        async for bucket in self.collection.find(query).sort([("updated_at", 1), ("_id", 1)]).batch_size(100):
+            if len(readings) >= limit:
+                return readings, key, True
+            readings.extend(self.rows(bucket))
+            key = (bucket["updated_at"], str(bucket["_id"]))
+        return readings, key, False
+
+    async def find_one(self, vital_signs_id: str) -> Optional[dict]:
+        bucket = await self.collection.find_one({"columns.id": vital_signs_id})
+        if not bucket:
+            return None
+        return self.row(bucket, bucket["columns"]["id"].index(vital_signs_id))
+
+    async def delete_one(self, vital_signs_id: str) -> Optional[dict]:
+        # Rewrite the bucket's columns guarded on its count, retrying if a
+        # concurrent insert or delete changed the bucket in between
+        while True:
+            bucket = await self.collection.find_one({"columns.id": vital_signs_id})
+            if not bucket:
+                return None
+            position = bucket["columns"]["id"].index(vital_signs_id)
+            guard = {"_id": bucket["_id"], "count": bucket["count"]}
+            if bucket["count"] <= 1:
+                done = (await self.collection.delete_one(guard)).deleted_count
+            else:
+                columns = {
+                    f"columns.{field}": values[:position] + values[position + 1:]
+                    for field, values in bucket["columns"].items()
+                }
+                done = (await self.collection.update_one(guard, {"$set": columns, "$inc": {"count": -1}})).modified_count
+            if done:
+                return self.row(bucket, position)
+
+    async def count_patient(self, patient_id: str, limit: int) -> int:
+        """Stored buckets of a patient, counting no further than limit."""
+        return await self.collection.count_documents({"patient_id": patient_id}, limit=limit)
+
+    async def find_patient_batch(self, patient_id: str, limit: int = 0, session=None) -> tuple:
+        """Return (bucket ids, readings) for up to limit buckets of a patient, all if 0.
+
+        The readings only carry the fields rollup_buckets needs.
+        """
+        projection = {"_id": 1, "patient_id": 1, "ward_number": 1, "columns.monitoring_datetime": 1}
+        buckets = await self.collection.find({"patient_id": patient_id}, projection, session=session).limit(limit).to_list(None)
+        readings = [
+            {"patient_id": bucket["patient_id"], "ward_number": bucket["ward_number"], "monitoring_datetime": moment}
+            for bucket in buckets
+            for moment in bucket["columns"]["monitoring_datetime"]
+        ]
+        return [bucket["_id"] for bucket in buckets], readings
+
+    async def delete_documents(self, document_ids: list, session=None):
+        await self.collection.delete_many({"_id": {"$in": document_ids}}, session=session)
+
+    async def propagate_patient(self, patient_id: str, meta: dict, limit: int) -> int:
+        """Copy meta onto up to limit buckets of the patient whose copies differ; returns how many.
+
+        A new ward or bed changes the bucket key, so a bucket whose window
+        already has a bucket under the new key is merged into that one.
+        """
+        stale = {"patient_id": patient_id, "$or": [{field: {"$ne": value}} for field, value in meta.items()]}
+        buckets = await self.collection.find(stale).limit(limit).to_list(None)
+        if not buckets:
+            return 0
+        try:
+            update = {"$set": {**meta, "updated_at": datetime.utcnow()}}
+            await self.collection.bulk_write([UpdateOne({"_id": bucket["_id"]}, update) for bucket in buckets], ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            for error in errors:
+                await self.merge_bucket(buckets[error["index"]], meta)
+        return len(buckets)
+
+    async def merge_bucket(self, bucket: dict, meta: dict):
+        """Move a bucket's readings into the bucket with meta for the same window, then drop it.
+
+        Readings the target already holds are skipped, so a merge interrupted
+        before the drop can safely run again.
+        """
+        target_key = {field: meta.get(field, bucket[field]) for field in self.bucket_key_fields}
+        target = await self.collection.find_one({**target_key, "bucket_start": bucket["bucket_start"]}, {"columns.id": 1})
+        merged = set(target["columns"]["id"]) if target else set()
+        readings = [{**reading, **meta} for reading in self.rows(bucket) if reading["id"] not in merged]
+        if readings:
+            await self.insert_many(readings)
+        await self.collection.delete_one({"_id": bucket["_id"]})
+
+    async def iter_readings(self, query: dict, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        bucket_query = dict(query)
+        if start or end:
+            bucket_query["bucket_start"] = time_range_filter(start - self.span if start else None, end)
+            if start:
+                bucket_query["bucket_start"]["$gt"] = bucket_query["bucket_start"].pop("$gte")
+        async for bucket in self.collection.find(bucket_query).batch_size(100):
+            for reading in self.rows(bucket):
+                moment = reading["monitoring_datetime"]
+                if (start and moment < start) or (end and moment >= end):
+                    continue
+                yield reading
+
+    async def find_columns(self, query: dict, start: datetime, end: datetime, fields) -> Dict[str, list]:
+        """Concatenated bucket columns for the given fields, plus readings just outside [start, end).
+
+        Meta fields are repeated once per reading; callers mask the time range.
+        """
+        bucket_query = {**query, "bucket_start": {"$gt": start - self.span, "$lt": end}}
+        projection = {"_id": 0, "count": 1}
+        projection.update({field if field in VITAL_SIGNS_META_FIELDS else f"columns.{field}": 1 for field in fields})
+        columns = {field: [] for field in fields}
+        async for bucket in self.read_collection.find(bucket_query, projection).batch_size(100):
+            count = bucket["count"]
+            for field, values in columns.items():
+                if field in VITAL_SIGNS_META_FIELDS:
+                    values.extend([bucket.get(field)] * count)
+                else:
+                    values.extend(bucket["columns"].get(field) or [None] * count)
+        return columns
+
+    async def summarize(self, query: dict, start: datetime, end: datetime, metrics, totals) -> Optional[dict]:
+        values = {"count": 0}
+        async for reading in self.iter_readings(query, start, end):
+            values["count"] += 1
+            for metric in metrics:
+                value = reading.get(metric)
+                if value is None:
+                    continue
+                values[f"{metric}_sum"] = values.get(f"{metric}_sum", 0) + value
+                values[f"{metric}_min"] = min(values.get(f"{metric}_min", value), value)
+                values[f"{metric}_max"] = max(values.get(f"{metric}_max", value), value)
+            for total in totals:
+                values[f"{total}_total"] = values.get(f"{total}_total", 0) + (reading.get(total) or 0)
+        if not values["count"]:
+            return None
+        for metric in metrics:
+            for suffix in ("sum", "min", "max"):
+                values.setdefault(f"{metric}_{suffix}", None)
+        return values
+
+    async def count(self) -> int:
+        totals = await self.read_collection.aggregate([{"$group": {"_id": None, "count": {"$sum": "$count"}}}]).to_list(1)
+        return totals[0]["count"] if totals else 0
+
+VITALS_STORES = {"documents": DocumentVitalSignsStore, "buckets": BucketedVitalSignsStore}
+
+def get_vitals_store(mode: str):
+    if mode not in VITALS_STORES:
+        raise ValueError(f"Unknown vital signs storage {mode!r}, expected one of {', '.join(VITALS_STORES)}")
+    return VITALS_STORES[mode]()
+
+vitals_store = get_vitals_store(VITALS_STORAGE)
+INDEXES[vitals_store.collection_name] = vitals_store.indexes
+
+async def migrate_vitals_storage(source_mode: str, target_mode: str, batch_size: int = 5000, drop_source: bool = False) -> int:
+    """Copy every reading from one storage layout to the other, keeping ids.
+
+    The target must be empty. Run with ingestion paused, then switch
+    VITALS_STORAGE to the target layout.
+    """
+    source = get_vitals_store(source_mode)
+    target = get_vitals_store(target_mode)
+    if source.collection_name == target.collection_name:
+        raise ValueError("Source and target storage are the same")
+    if await target.count():
+        raise ValueError(f"Target collection {target.collection_name} is not empty")
+    await target.collection.create_indexes(target.indexes)
+    
+    copied = 0
+    batch = []
+    async for reading in source.iter_readings({}):
+        batch.append(reading)
+        if len(batch) >= batch_size:
+            await target.insert_many(batch)
+            copied += len(batch)
+            batch = []
+    if batch:
+        await target.insert_many(batch)
+        copied += len(batch)
+    
+    if drop_source:
+        await source.collection.drop()
+    return copied
+
+
 # Vital Signs endpoints
 @api_router.post("/vital-signs", response_model=VitalSigns)
-async def create_vital_signs(vital_signs: VitalSignsCreate):
+async def create_vital_signs(vital_signs: VitalSignsCreate, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    return await with_idempotency(idempotency_key, "POST /vital-signs", vital_signs, lambda: insert_vital_signs(vital_signs))
+
+async def insert_vital_signs(vital_signs: VitalSignsCreate) -> VitalSigns:
     # Get patient details for auto-fill
-    patient = await db.patients.find_one({"id": vital_signs.patient_id})
+    patient = (await get_patient_summaries([vital_signs.patient_id])).get(vital_signs.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    vital_signs_dict = vital_signs.dict()
-    vital_signs_dict["patient_name"] = patient["full_name"]
-    vital_signs_dict["ward_number"] = patient["ward_number"]
-    vital_signs_dict["bed_number"] = patient["bed_number"]
-    
-    vital_signs_obj = VitalSigns(**vital_signs_dict)
-    await db.vital_signs.insert_one(vital_signs_obj.dict())
+    vital_signs_obj = build_vital_signs(vital_signs, patient)
+    vital_signs_doc = vital_signs_obj.dict()
+    failures = await vitals_store.insert_many([vital_signs_doc])
+    if failures:
+        raise HTTPException(status_code=409, detail=failures[0][1])
+    await apply_rollup_updates(rollup_updates([vital_signs_doc]))
+    await record_latest_scores([vital_signs_doc])
+    await record_change("vital_signs")
+    event_bus.publish("vital_signs.created", [vital_signs_obj.ward_number], vital_signs_obj)
     
     return vital_signs_obj
 
-@api_router.get("/vital-signs", response_model=List[VitalSigns])
+@api_router.post("/vital-signs/bulk", response_model=BulkIngestResult)
+async def create_vital_signs_bulk(
+    request: Request,
+    batch_size: int = Query(VITALS_BULK_BATCH_SIZE, ge=1, le=5000, description="Readings written per insert_many")
+):
+    """Ingest a JSON array or an NDJSON stream (application/x-ndjson) of readings.
+
+    Items are validated individually; invalid items and readings for unknown
+    patients are reported by index and the rest are still written.
+    """
+    result = BulkIngestResult()
+    batch = []
+    async for raw_item in iter_bulk_items(request):
+        index = result.received
+        result.received += 1
+        try:
+            item = json.loads(raw_item) if isinstance(raw_item, bytes) else raw_item
+            batch.append((index, VitalSignsCreate.model_validate(item)))
+        except ValidationError as e:
+            result.errors.append(BulkItemError(index=index, detail=json.loads(e.json(include_url=False))))
+        except ValueError:
+            result.errors.append(BulkItemError(index=index, detail="Invalid JSON"))
+        if len(batch) >= batch_size:
+            await insert_vital_signs_batch(batch, result)
+            batch = []
+    if batch:
+        await insert_vital_signs_batch(batch, result)
+    
+    if result.inserted:
+        await record_change("vital_signs")
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
+@api_router.get("/vital-signs/rollups", response_model=List[VitalSignsRollup])
+async def get_vital_signs_rollups(
+    patient_id: Optional[str] = Query(None, description="Rollups for one patient"),
+    ward: Optional[str] = Query(None, description="Rollups for one ward"),
+    granularity: Granularity = Query(Granularity.HOUR, description="hour or day"),
+    start: Optional[datetime] = Query(None, description="Earliest bucket start (UTC)"),
+    end: Optional[datetime] = Query(None, description="Buckets starting before this time (UTC)"),
+    limit: int = Query(500, ge=1, le=5000, description="Most recent buckets to return")
+):
+    if bool(patient_id) == bool(ward):
+        raise HTTPException(status_code=400, detail="Specify exactly one of patient_id or ward")
+    
+    query = {"scope": "patient", "key": patient_id} if patient_id else {"scope": "ward", "key": ward}
+    query["granularity"] = granularity.value
+    if start or end:
+        query["bucket_start"] = {}
+        if start:
+            query["bucket_start"]["$gte"] = bucket_start(start, granularity)
+        if end:
+            query["bucket_start"]["$lt"] = end.astimezone(timezone.utc).replace(tzinfo=None) if end.tzinfo else end
+    
+    buckets = await db.vital_signs_rollups.find(query, {"_id": 0}).sort("bucket_start", -1).limit(limit).to_list(limit)
+    return [rollup_response(bucket) for bucket in reversed(buckets)]
+
+@api_router.get("/vital-signs", response_model=Union[List[VitalSigns], List[VitalSignsSummary]])
+@stale_reads_ok
 async def get_vital_signs(
+    request: Request,
     patient_id: Optional[str] = Query(None, description="Filter by patient ID"),
     ward: Optional[str] = Query(None, description="Filter by ward number"),
-    limit: int = Query(100, description="Limit number of results")
+    view: View = Query(View.FULL, description="summary for the vital signs table columns, full for every field"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit number of results")
 ):
+    etag = await change_etag(("vital_signs",), request.url.query)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     query = {}
     
     if patient_id:
@@ -324,51 +2527,308 @@ async def get_vital_signs(
     if ward:
         query["ward_number"] = ward
     
-    vital_signs = await db.vital_signs.find(query).sort("monitoring_datetime", -1).limit(limit).to_list(limit)
-    return [VitalSigns(**vs) for vs in vital_signs]
+    after = None
+    if cursor:
+        last_datetime, last_id = decode_cursor(cursor, 2)
+        try:
+            after = (utc_naive(datetime.fromisoformat(last_datetime)), last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    vital_signs = await vitals_store.find_page(query, after, limit + 1, VITAL_SIGNS_VIEWS[view])
+    headers = validator_headers(etag)
+    if len(vital_signs) > limit:
+        vital_signs = vital_signs[:limit]
+        last = vital_signs[-1]
+        headers["X-Next-Cursor"] = encode_cursor([last["monitoring_datetime"].isoformat(), last["id"]])
+    return ORJSONResponse(vital_signs, headers=headers)
 
 @api_router.get("/vital-signs/{vital_signs_id}", response_model=VitalSigns)
 async def get_vital_sign(vital_signs_id: str):
-    vital_signs = await db.vital_signs.find_one({"id": vital_signs_id})
+    vital_signs = await vitals_store.find_one(vital_signs_id)
     if not vital_signs:
         raise HTTPException(status_code=404, detail="Vital signs record not found")
     
-    return VitalSigns(**vital_signs)
+    return ORJSONResponse(vital_signs)
 
 @api_router.delete("/vital-signs/{vital_signs_id}")
 async def delete_vital_signs(vital_signs_id: str):
-    result = await db.vital_signs.delete_one({"id": vital_signs_id})
-    if result.deleted_count == 0:
+    deleted = await vitals_store.delete_one(vital_signs_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Vital signs record not found")
     
+    for bucket in rollup_buckets(deleted):
+        await recompute_rollup_bucket(*bucket)
+    latest = {"_id": deleted["patient_id"], "vital_signs_id": vital_signs_id}
+    if await db.early_warning_scores.find_one(latest, {"_id": 1}):
+        await refresh_latest_score(deleted["patient_id"])
+    await record_tombstone("vital_signs", vital_signs_id)
+    await record_change("vital_signs")
+    event_bus.publish(
+        "vital_signs.deleted", [deleted["ward_number"]], {"id": vital_signs_id, "patient_id": deleted["patient_id"]}
+    )
     return {"message": "Vital signs record deleted successfully"}
 
 
-# Statistics endpoints
-@api_router.get("/stats/overview")
-async def get_overview_stats():
-    total_patients = await db.patients.count_documents({"discharged": YesNoEnum.NO})
-    high_risk_patients = await db.patients.count_documents({
-        "discharged": YesNoEnum.NO,
-        "high_risk": YesNoEnum.YES
-    })
+# Early-warning alerts
+@api_router.get("/alerts", response_model=List[EarlyWarningAlert])
+async def get_alerts(
+    request: Request,
+    ward: Optional[str] = Query(None, description="Filter by ward number"),
+    min_score: int = Query(MEOWS_ALERT_SCORE, ge=1, description="Lowest early-warning score to list"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit number of results")
+):
+    """Patients whose latest reading scores min_score or more, highest score first."""
+    etag = await change_etag(("patients", "vital_signs"), request.url.query)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    query = {"ews_score": {"$gte": min_score}}
+    if ward:
+        query["ward_number"] = ward
+    cursor = db.early_warning_scores.find(query, {"_id": 0}).sort([("ews_score", -1), ("monitoring_datetime", -1)])
+    return ORJSONResponse(await cursor.limit(limit).to_list(limit), headers=validator_headers(etag))
+
+
+# Vital signs analytics
+@api_router.get("/analytics/vitals")
+@stale_reads_ok
+async def get_vitals_analytics(
+    patient_id: Optional[str] = Query(None, description="Trends for one patient"),
+    ward: Optional[str] = Query(None, description="Trends for every patient with readings in a ward"),
+    hours: int = Query(72, ge=1, le=24 * 31, description="Length of the period analysed"),
+    window: int = Query(6, ge=1, le=168, description="Rolling mean and fluid balance window in hours"),
+    end: Optional[datetime] = Query(None, description="End of the period (UTC), now if omitted")
+):
+    """Rolling means, slopes per hour, out-of-range counts and fluid balance per patient."""
+    if bool(patient_id) == bool(ward):
+        raise HTTPException(status_code=400, detail="Specify exactly one of patient_id or ward")
     
-    # Get ward statistics
+    if end is None:
+        end = datetime.utcnow()
+    elif end.tzinfo:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    start = end - timedelta(hours=hours)
+    query = {"patient_id": patient_id} if patient_id else {"ward_number": ward}
+    columns = await vitals_store.find_columns(query, start, end, analytics.COLUMNS)
+    # Out of range means inside any early-warning band, yellow or red
+    ranges = {metric: [(low, high) for _, low, high in bands] for metric, bands in MEOWS_BANDS.items()}
+    return ORJSONResponse(analytics.vitals_trends(columns, start, end, window, ranges))
+
+
+# Ward census endpoints
+@api_router.get("/wards/{ward}/census", response_model=WardCensus)
+async def get_ward_census(ward: str, request: Request):
+    # The census changes only with patient writes, which bump the patients version
+    etag = await change_etag(("patients",), ward)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    entries = await db.ward_census.find({"ward_number": ward}, {"ward_number": 0}).sort("bed_number", 1).to_list(None)
+    beds = [
+        {
+            "bed_number": entry["bed_number"],
+            "id": entry["_id"],
+            "patient_id": entry["patient_id"],
+            "full_name": entry["full_name"],
+            "admission_date": from_bson_date(entry["admission_date"]),
+            "high_risk": entry["high_risk"],
+        }
+        for entry in entries
+    ]
+    return ORJSONResponse(
+        {"ward_number": ward, "occupied_beds": len(beds), "beds": beds}, headers=validator_headers(etag)
+    )
+
+
+# Statistics endpoints
+async def compute_overview_stats() -> dict:
+    # One pass over patients; the vitals total comes from the storage layer
     pipeline = [
-        {"$match": {"discharged": YesNoEnum.NO}},
-        {"$group": {"_id": "$ward_number", "count": {"$sum": 1}}},
-        {"$sort": {"_id": 1}}
+        {"$facet": {
+            "wards": [
+                {"$match": {"discharged": YesNoEnum.NO}},
+                {"$group": {
+                    "_id": "$ward_number",
+                    "count": {"$sum": 1},
+                    "high_risk": {"$sum": {"$cond": [{"$eq": ["$high_risk", YesNoEnum.YES.value]}, 1, 0]}}
+                }},
+                {"$sort": {"_id": 1}}
+            ],
+            "discharged": [
+                {"$match": {"discharged": YesNoEnum.YES}},
+                {"$count": "count"}
+            ]
+        }}
     ]
-    ward_stats = await db.patients.aggregate(pipeline).to_list(100)
+    facets, vital_signs_count = await asyncio.gather(
+        read_db().patients.aggregate(pipeline).to_list(1),
+        vitals_store.count()
+    )
+    wards = facets[0]["wards"] if facets else []
+    discharged = facets[0]["discharged"] if facets else []
     
     return {
-        "total_patients": total_patients,
-        "high_risk_patients": high_risk_patients,
-        "discharged_patients": await db.patients.count_documents({"discharged": YesNoEnum.YES}),
-        "ward_statistics": ward_stats,
-        "recent_vital_signs": await db.vital_signs.count_documents({})
+        "total_patients": sum(ward["count"] for ward in wards),
+        "high_risk_patients": sum(ward["high_risk"] for ward in wards),
+        "discharged_patients": discharged[0]["count"] if discharged else 0,
+        "ward_statistics": [{"_id": ward["_id"], "count": ward["count"]} for ward in wards],
+        "recent_vital_signs": vital_signs_count
     }
 
+@api_router.get("/stats/overview")
+@stale_reads_ok
+async def get_overview_stats(request: Request):
+    etag = await change_etag(("patients", "vital_signs"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    # Versioned by the tag so a write made through another worker is never served under its new version
+    stats = await stats_cache.get_or_compute("overview", compute_overview_stats, version=etag)
+    return ORJSONResponse(stats, headers=validator_headers(etag))
+
+@api_router.get("/stats/cache")
+async def get_cache_stats():
+    """Hit and miss counters of this worker's patient auto-fill cache."""
+    return {"patient_cache": patient_cache.stats()}
+
+
+# Delta sync for offline replicas
+async def record_tombstone(kind: str, record_id: str, session=None):
+    """Remember a deletion so offline replicas can apply it on their next sync."""
+    await db.tombstones.insert_one({"kind": kind, "id": record_id, "deleted_at": datetime.utcnow()}, session=session)
+
+def caught_up_key(last_key: Optional[tuple], now: datetime) -> tuple:
+    """Rewind a fully-read position by the overlap window; resent rows are harmless upserts."""
+    rewound = (now - timedelta(seconds=SYNC_OVERLAP_SECONDS), "")
+    return min(last_key, rewound) if last_key else rewound
+
+@api_router.get("/sync")
+async def sync(
+    since: Optional[str] = Query(None, description="next_token from the previous sync; omit for a full sync"),
+    limit: int = Query(1000, ge=1, le=5000, description="Patients and vital signs returned per call")
+):
+    """Changes since a sync token: upserted patients and readings plus deleted ids.
+
+    Keep calling with next_token while has_more is true. When reset is true
+    the token was older than the tombstone retention and the client must
+    discard its replica before applying the response.
+    """
+    now = datetime.utcnow()
+    reset = False
+    patients_after = vitals_after = None
+    deleted_since = None
+    if since:
+        values = decode_cursor(since, 5)
+        try:
+            patients_ts, vitals_ts, deleted_ts = (datetime.fromisoformat(values[i]) for i in (0, 2, 4))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if deleted_ts < now - timedelta(seconds=SYNC_TOMBSTONE_TTL_SECONDS):
+            reset = True
+        else:
+            patients_after = (patients_ts, values[1])
+            vitals_after = (vitals_ts, values[3])
+            deleted_since = deleted_ts
+    
+    patient_query = keyset_filter({}, "updated_at", patients_after[0], patients_after[1]) if patients_after else {}
+    patients = await find_patients(patient_query, [("updated_at", 1), ("id", 1)], limit + 1).to_list(limit + 1)
+    vital_signs, vitals_key, vitals_more = await vitals_store.find_sync_page(vitals_after, limit)
+    deleted = {"patients": [], "vital_signs": []}
+    if deleted_since:
+        async for tombstone in db.tombstones.find({"deleted_at": {"$gte": deleted_since}}, {"_id": 0, "kind": 1, "id": 1}):
+            deleted["patients" if tombstone["kind"] == "patient" else "vital_signs"].append(tombstone["id"])
+    
+    has_more = len(patients) > limit or vitals_more
+    patients = patients[:limit]
+    patients_key = (patients[-1]["updated_at"], patients[-1]["id"]) if patients else patients_after
+    if len(patients) < limit:
+        patients_key = caught_up_key(patients_key, now)
+    if not vitals_more:
+        vitals_key = caught_up_key(vitals_key, now)
+    # Tombstones are only consumed once every page of upserts has been read
+    deleted_key = deleted_since if has_more and deleted_since else now - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+    
+    return ORJSONResponse({
+        "patients": [patient_from_document(patient) for patient in patients],
+        "vital_signs": vital_signs,
+        "deleted": deleted,
+        "next_token": encode_cursor([
+            patients_key[0].isoformat(), patients_key[1],
+            vitals_key[0].isoformat(), vitals_key[1],
+            deleted_key.isoformat()
+        ]),
+        "has_more": has_more,
+        "reset": reset
+    })
+
+
+# Offline outbox replay
+async def replay_outbox_request(item: OutboxRequest):
+    path = item.path.split("?")[0].rstrip("/")
+    method = item.method.upper()
+    patient_path = re.fullmatch(r"/api/patients/([^/]+)", path)
+    if method == "POST" and path == "/api/patients":
+        return await create_patient(PatientCreate.model_validate(item.body), item.idempotency_key)
+    if method == "PUT" and patient_path:
+        return await update_patient(patient_path.group(1), PatientUpdate.model_validate(item.body), item.idempotency_key)
+    if method == "POST" and path == "/api/vital-signs":
+        return await create_vital_signs(VitalSignsCreate.model_validate(item.body), item.idempotency_key)
+    raise HTTPException(status_code=404, detail=f"{method} {path} cannot be replayed from the outbox")
+
+@api_router.post("/outbox", response_model=List[OutboxResult])
+async def replay_outbox(batch: OutboxBatch):
+    """Replay writes queued offline, in order, in one request.
+
+    Every queued write carries the Idempotency-Key it was first sent with, so
+    writes that already reached the server are not applied twice.
+    """
+    results = []
+    for item in batch.requests:
+        retry = False
+        try:
+            response = await replay_outbox_request(item)
+            body = orjson.loads(response.body) if isinstance(response, Response) else jsonable_encoder(response)
+            status_code = 200
+        except HTTPException as e:
+            status_code, body = e.status_code, {"detail": e.detail}
+            retry = bool(e.headers and "Retry-After" in e.headers)
+        except ValidationError as e:
+            status_code, body = 422, {"detail": json.loads(e.json(include_url=False))}
+        results.append(OutboxResult(idempotency_key=item.idempotency_key, status_code=status_code, body=body, retry=retry))
+    return results
+
+
+# Live event stream
+@api_router.get("/stream")
+async def stream_events(
+    request: Request,
+    ward: Optional[str] = Query(None, description="Only send events for this ward")
+):
+    """Server-sent events for patient and vital-sign creates, updates and deletes."""
+    queue = event_bus.subscribe(ward)
+    
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            event_bus.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # An explicit encoding keeps GZipMiddleware from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"}
+    )
+
 
 # Test endpoint
 @api_router.get("/")
@@ -385,8 +2845,11 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=6)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -394,6 +2857,138 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats = RequestMongoStats()
+    token = request_mongo_stats.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        request_mongo_stats.reset(token)
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_DURATION.labels(request.method, route, str(status)).observe(elapsed)
+        MONGO_REQUEST_COMMANDS.labels(route).observe(stats.commands)
+        MONGO_REQUEST_DURATION.labels(route).observe(stats.duration)
+        if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+            logger.warning(
+                f"Slow request {request.method} {request.url.path}{'?' if request.url.query else ''}{request.url.query} -> {status} "
+                f"in {elapsed * 1000:.0f}ms, {stats.commands} Mongo commands in {stats.duration * 1000:.0f}ms: "
+                f"{json.dumps(stats.shapes, default=str)}"
+            )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    try:
+        server_status = await db.command("serverStatus")
+        MONGO_SERVER_DOCUMENTS.labels("examined").set(server_status["metrics"]["queryExecutor"]["scannedObjects"])
+        MONGO_SERVER_DOCUMENTS.labels("keys_examined").set(server_status["metrics"]["queryExecutor"]["scanned"])
+        MONGO_SERVER_DOCUMENTS.labels("returned").set(server_status["metrics"]["document"]["returned"])
+    except (PyMongoError, KeyError) as e:
+        # serverStatus needs the clusterMonitor role; the per-request metrics still work without it
+        logger.debug(f"serverStatus unavailable for metrics: {e}")
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Several workers: merge the per-process metric files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+async def ensure_indexes() -> dict:
+    """Create missing indexes and report any whose definition has drifted.
+
+    Indexes are matched by key pattern rather than name. Drifted indexes are
+    only reported, never dropped, since rebuilding one on a live ward
+    database is an operator decision.
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        by_key = {tuple(info["key"]): (name, info) for name, info in existing.items()}
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            match = by_key.get(tuple(spec["key"].items()))
+            if match is None:
+                logger.warning(f"Index {collection_name}.{name} is missing, creating it")
+                try:
+                    await collection.create_indexes([model])
+                    report[f"{collection_name}.{name}"] = "created"
+                except OperationFailure as e:
+                    logger.error(f"Could not create index {collection_name}.{name}: {e}")
+                    report[f"{collection_name}.{name}"] = "failed"
+                continue
+            existing_name, info = match
+            drift = [
+                option for option in INDEX_OPTIONS
+                if spec.get(option) != info.get(option) and (spec.get(option) or info.get(option))
+            ]
+            if drift:
+                logger.warning(
+                    f"Index {collection_name}.{existing_name} differs from its declaration on: {', '.join(drift)}"
+                )
+                report[f"{collection_name}.{name}"] = "drifted"
+            else:
+                report[f"{collection_name}.{name}"] = "ok"
+    return report
+
+async def backfill_search_fields(batch_size: int = 500) -> int:
+    """Add search tokens to patients created before search indexing existed."""
+    updated = 0
+    batch = []
+    projection = {field: 1 for field in ("id",) + SEARCH_FIELDS}
+    async for patient in db.patients.find({"search_prefixes": {"$exists": False}}, projection):
+        batch.append(UpdateOne({"_id": patient["_id"]}, {"$set": build_search_fields(patient)}))
+        if len(batch) >= batch_size:
+            updated += (await db.patients.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.patients.bulk_write(batch, ordered=False)).modified_count
+    if updated:
+        logger.info(f"Added search tokens to {updated} patients")
+    return updated
+
+async def backfill_native_dates(batch_size: int = 500) -> int:
+    """Store ISO string birthdates and admission dates from older patients as BSON dates.
+
+    A string that is not a date is moved to unreadable_dates.<field>, so the
+    date field only ever holds a BSON date (or nothing) and the age
+    expression never meets a string.
+    """
+    updated = 0
+    batch = []
+    query = {"$or": [{field: {"$type": "string"}} for field in PATIENT_DATE_FIELDS]}
+    projection = {"id": 1, **{field: 1 for field in PATIENT_DATE_FIELDS}}
+    async for patient in db.patients.find(query, projection):
+        update = {"$set": {}, "$unset": {}}
+        for field in PATIENT_DATE_FIELDS:
+            if not isinstance(patient.get(field), str):
+                continue
+            try:
+                update["$set"][field] = to_bson_date(from_bson_date(patient[field]))
+            except ValueError:
+                logger.warning(f"Patient {patient.get('id')} has an unreadable {field} {patient[field]!r}, moving it aside")
+                update["$set"][f"unreadable_dates.{field}"] = patient[field]
+                update["$unset"][field] = ""
+        batch.append(UpdateOne({"_id": patient["_id"]}, {key: value for key, value in update.items() if value}))
+        if len(batch) >= batch_size:
+            updated += (await db.patients.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.patients.bulk_write(batch, ordered=False)).modified_count
+    if updated:
+        logger.info(f"Converted dates to BSON dates on {updated} patients")
+    return updated
+
+async def drop_stored_ages() -> int:
+    """Remove the age field older patients stored, which went stale; age is now derived on read."""
+    result = await db.patients.update_many({"age": {"$exists": True}}, {"$unset": {"age": ""}})
+    if result.modified_count:
+        logger.info(f"Removed stored age from {result.modified_count} patients")
+    return result.modified_count
@@ -0,0 +1,88 @@
+"""MongoDB connection settings for the Patient Tracker backend.
+
+Every value comes from the environment (or backend/.env). With several
+workers, each one opens its own connection pool, so the pool size is derived
+from a deployment-wide connection budget when MONGO_MAX_CONNECTIONS is set:
+see ``python manage.py serve``.
+"""
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ['MONGO_URL']
+DB_NAME = os.environ['DB_NAME']
+
+# Worker processes serving the app; set by the launcher
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Connections this deployment may open to Mongo across all workers (0 = no
+# budget). Each client also keeps a monitoring connection per server, which
+# the pool size does not count, so leave some headroom below the server limit.
+MONGO_MAX_CONNECTIONS = int(os.environ.get('MONGO_MAX_CONNECTIONS', '0'))
+
+# Per-worker pool; an explicit MONGO_MAX_POOL_SIZE wins over the budget
+if 'MONGO_MAX_POOL_SIZE' in os.environ:
+    MONGO_MAX_POOL_SIZE = int(os.environ['MONGO_MAX_POOL_SIZE'])
+elif MONGO_MAX_CONNECTIONS:
+    MONGO_MAX_POOL_SIZE = max(1, MONGO_MAX_CONNECTIONS // WEB_CONCURRENCY)
+else:
+    MONGO_MAX_POOL_SIZE = 100
+MONGO_MIN_POOL_SIZE = min(int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')), MONGO_MAX_POOL_SIZE)
+
+# How long a request waits for a free pooled connection, and for a suitable
+# server to be found, before failing instead of queueing indefinitely
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+
+# Default read preference (primary, primaryPreferred, secondary,
+# secondaryPreferred or nearest) and write concern for every operation
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+MONGO_WRITE_CONCERN_W = os.environ.get('MONGO_WRITE_CONCERN_W', 'majority')
+MONGO_WRITE_CONCERN_JOURNAL = os.environ.get('MONGO_WRITE_CONCERN_JOURNAL', 'true').lower() == 'true'
+MONGO_WRITE_CONCERN_TIMEOUT_MS = int(os.environ.get('MONGO_WRITE_CONCERN_TIMEOUT_MS', '10000'))
+
+# Read preference for endpoints marked as tolerating stale reads (dashboard
+# lists and stats), and how far a secondary may lag the primary and still
+# serve them; MongoDB rejects a max staleness below 90 seconds
+MONGO_STALE_READ_PREFERENCE = os.environ.get('MONGO_STALE_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def mongo_client_options() -> dict:
+    """Keyword arguments for AsyncIOMotorClient; pymongo validates them when the client is created."""
+    w = int(MONGO_WRITE_CONCERN_W) if MONGO_WRITE_CONCERN_W.isdigit() else MONGO_WRITE_CONCERN_W
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "w": w,
+        "journal": MONGO_WRITE_CONCERN_JOURNAL,
+        "wTimeoutMS": MONGO_WRITE_CONCERN_TIMEOUT_MS,
+    }
+
+
+def stale_read_preference():
+    """The read preference for stale-tolerant reads, bounded by MONGO_MAX_STALENESS_SECONDS."""
+    mode = READ_PREFERENCES[MONGO_STALE_READ_PREFERENCE]
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=MONGO_MAX_STALENESS_SECONDS)
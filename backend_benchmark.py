@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Hospital Maternity Patient Tracker backend
+Seeds patients and vital signs, drives concurrent load against the API
+endpoints in-process and reports latency percentiles and throughput.
+
+    python backend_benchmark.py --mongo-url mongodb://localhost:27017   # 5000 patients, 2M readings
+    python backend_benchmark.py --patients 1000 --readings-per-patient 20  # quick mongomock-motor run
+    python backend_benchmark.py --save-baseline                  # record the current numbers
+    python backend_benchmark.py --check                          # exit 1 if a gated endpoint regressed
+
+The app runs with its lifespan, so the indexes, ward census, backfills and
+column setup a deployment has are in place before anything is measured.
+Seeding the default volume into the in-memory mongomock-motor stand-in takes
+a long time and several GB; pass smaller sizes for a quick local run.
+
+A baseline only applies to runs with the same backend, seed sizes and load
+settings, so keep one baseline file per CI machine and configuration.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / "benchmark_baseline.json"
+
+# Endpoints whose regressions fail --check
+GATED_SCENARIOS = ("get_patients", "create_vital_signs", "get_overview_stats")
+
+FIRST_NAMES = ["Sarah", "Maria", "Aisha", "Grace", "Mei", "Fatima", "Ana", "Joy", "Priya", "Hannah", "Leah", "Rosa"]
+LAST_NAMES = ["Johnson", "Rodriguez", "Santos", "Okafor", "Chen", "Reyes", "Khan", "Garcia", "Mensah", "Cruz"]
+DIAGNOSES = [
+    "Pregnancy - 38 weeks gestation",
+    "High-risk pregnancy - gestational diabetes",
+    "Pre-eclampsia",
+    "Post-partum monitoring",
+    "Preterm labour - 34 weeks",
+]
+IV_FLUIDS = ["", "D5LR", "PNSS", "D5NM"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Benchmark against this MongoDB instead of mongomock-motor")
+    parser.add_argument("--db-name", default="patient_tracker_benchmark", help="Database to seed; it is dropped first")
+    parser.add_argument("--patients", type=int, default=5000, help="Patients to seed")
+    parser.add_argument("--readings-per-patient", type=int, default=400, help="Vital sign readings seeded per patient")
+    parser.add_argument("--wards", type=int, default=8, help="Wards the patients are spread over")
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint before timing")
+    parser.add_argument("--seed", type=int, default=2025, help="Random seed for the generated data and requests")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline file to save or check")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results to the baseline file")
+    parser.add_argument("--check", action="store_true", help="Compare against the baseline and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 and throughput drift for --check")
+    parser.add_argument("--output", type=Path, help="Also write this run's results as JSON")
+    return parser.parse_args()
+
+
+def load_server(args):
+    # settings.py reads the connection settings when server.py is imported
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    sys.path.insert(0, str(ROOT_DIR / "backend"))
+    import server
+
+    if args.mongo_url:
+        server.connect_mongo()
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+    return server
+
+
+# Seeding
+def generate_patients(server, args, rng):
+    today = date.today()
+    for number in range(args.patients):
+        ward = f"Ward-{chr(ord('A') + number % args.wards)}"
+        yield server.build_patient(server.PatientCreate(
+            patient_id=f"BENCH{number:07d}",
+            full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            birthdate=today - timedelta(days=rng.randint(15 * 365, 45 * 365)),
+            address=f"{rng.randint(1, 999)} Main Street, Springfield",
+            ward_number=ward,
+            bed_number=f"{ward[-1]}-{number // args.wards + 1:03d}",
+            admission_date=today - timedelta(days=rng.randint(0, 30)),
+            diagnosis=rng.choice(DIAGNOSES),
+            high_risk="Yes" if rng.random() < 0.2 else "No",
+            discharged="Yes" if rng.random() < 0.1 else "No",
+            notes=rng.choice(["", "First pregnancy, no complications", "Allergic to penicillin"]),
+        ))
+
+
+def generate_readings(server, patient, args, rng):
+    start = datetime.utcnow() - timedelta(hours=4 * args.readings_per_patient)
+    for number in range(args.readings_per_patient):
+        fluids = rng.choice(IV_FLUIDS)
+        yield server.build_vital_signs(server.VitalSignsCreate(
+            patient_id=patient["id"],
+            monitoring_datetime=start + timedelta(hours=4 * number, minutes=rng.randint(0, 59)),
+            blood_pressure=f"{rng.randint(95, 160)}/{rng.randint(55, 105)}",
+            heart_rate=rng.randint(60, 130),
+            temperature=round(rng.uniform(36.0, 38.8), 1),
+            respiratory_rate=rng.randint(12, 26),
+            spo2=rng.randint(92, 100),
+            pain_score=rng.randint(0, 10),
+            iv_fluids_type=fluids,
+            iv_fluids_volume=rng.choice([500, 1000]) if fluids else None,
+            urine_output=rng.randint(30, 400),
+        ), patient).model_dump()
+
+
+async def seed(server, args, rng, batch_size=5000):
+    if args.mongo_url:
+        await server.client.drop_database(args.db_name)
+
+    patients = list(generate_patients(server, args, rng))
+    for start in range(0, len(patients), batch_size):
+        await server.db.patients.insert_many(patients[start:start + batch_size])
+
+    batch = []
+    for patient in patients:
+        batch.extend(generate_readings(server, patient, args, rng))
+        if len(batch) >= batch_size:
+            await server.vitals_store.insert_many(batch)
+            batch = []
+    if batch:
+        await server.vitals_store.insert_many(batch)
+    # The lifespan builds the indexes afterwards, which is much faster than maintaining them during the bulk load
+    return [patient["id"] for patient in patients]
+
+
+# Scenarios: each returns (method, url, json body) for one request
+def scenarios(patient_ids, args, rng):
+    wards = [f"Ward-{chr(ord('A') + number)}" for number in range(args.wards)]
+
+    def reading():
+        return {
+            "patient_id": rng.choice(patient_ids),
+            "monitoring_datetime": datetime.utcnow().isoformat(),
+            "blood_pressure": f"{rng.randint(95, 160)}/{rng.randint(55, 105)}",
+            "heart_rate": rng.randint(60, 130),
+            "temperature": round(rng.uniform(36.0, 38.8), 1),
+            "respiratory_rate": rng.randint(12, 26),
+            "spo2": rng.randint(92, 100),
+            "pain_score": rng.randint(0, 10),
+        }
+
+    return {
+        "get_patients": lambda: ("GET", "/api/patients?limit=200", None),
+        "get_patients_summary_by_ward": lambda: ("GET", f"/api/patients?view=summary&ward={rng.choice(wards)}", None),
+        "search_patients": lambda: ("GET", f"/api/patients?search={rng.choice(FIRST_NAMES)[:3]}&limit=50", None),
+        "get_patient": lambda: ("GET", f"/api/patients/{rng.choice(patient_ids)}", None),
+        "get_vital_signs": lambda: ("GET", f"/api/vital-signs?patient_id={rng.choice(patient_ids)}&limit=50", None),
+        "create_vital_signs": lambda: ("POST", "/api/vital-signs", reading()),
+        "get_overview_stats": lambda: ("GET", "/api/stats/overview", None),
+    }
+
+
+def percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(http, make_request, requests, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, body = make_request()
+            started = time.perf_counter()
+            response = await http.request(method, url, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def configuration(args):
+    return {
+        "backend": "mongodb" if args.mongo_url else "mongomock-motor",
+        "patients": args.patients,
+        "readings_per_patient": args.readings_per_patient,
+        "wards": args.wards,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+
+
+def check_baseline(results, args):
+    """Return the regressions of the gated scenarios against the saved baseline."""
+    if not args.baseline.exists():
+        return [f"No baseline at {args.baseline}; record one with --save-baseline"]
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["configuration"] != configuration(args):
+        return [f"Baseline configuration {baseline['configuration']} does not match this run"]
+
+    regressions = []
+    for name in GATED_SCENARIOS:
+        current, reference = results[name], baseline["results"].get(name)
+        if not reference:
+            regressions.append(f"{name}: missing from baseline")
+            continue
+        if current["errors"]:
+            regressions.append(f"{name}: {current['errors']} failed requests")
+        if current["p95_ms"] > reference["p95_ms"] * (1 + args.tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {reference['p95_ms']}ms")
+        if current["throughput_rps"] < reference["throughput_rps"] * (1 - args.tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']}/s vs baseline {reference['throughput_rps']}/s"
+            )
+    return regressions
+
+
+async def benchmark(args):
+    import httpx
+
+    server = load_server(args)
+    rng = random.Random(args.seed)
+
+    print(f"🌱 Seeding {args.patients} patients and {args.patients * args.readings_per_patient} vital signs "
+          f"({configuration(args)['backend']})")
+    started = time.perf_counter()
+    patient_ids = await seed(server, args, rng)
+    print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+    # ASGITransport does not send lifespan events, so run the app's startup and shutdown around the load
+    started = time.perf_counter()
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        print(f"   started the app in {time.perf_counter() - started:.1f}s")
+        for name, make_request in scenarios(patient_ids, args, rng).items():
+            if args.warmup:
+                await run_scenario(http, make_request, args.warmup, min(args.concurrency, args.warmup))
+            results[name] = await run_scenario(http, make_request, args.requests, args.concurrency)
+            result = results[name]
+            print(f"⏱️  {name:30} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                  f"p99 {result['p99_ms']:8.2f}ms  {result['throughput_rps']:8.1f} req/s  errors {result['errors']}")
+    return results
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(benchmark(args))
+    report = {"configuration": configuration(args), "recorded_at": datetime.utcnow().isoformat(), "results": results}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Baseline saved to {args.baseline}")
+    if args.check:
+        regressions = check_baseline(results, args)
+        if regressions:
+            print("\n🚨 Regressions:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of the baseline for {', '.join(GATED_SCENARIOS)}")
+
+
+if __name__ == "__main__":
+    main()
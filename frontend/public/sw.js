@@ -7,6 +7,130 @@ const urlsToCache = [
   '/manifest.json'
 ];
 
+// Offline outbox: patient and vital-sign writes that fail for lack of network
+// are queued in IndexedDB with their Idempotency-Key and replayed together
+// through POST /api/outbox once the network is back
+const OUTBOX_DB = 'kharkis-patient-tracker-outbox';
+// Only the JSON writes the outbox endpoint replays; POST /api/patients/import
+// carries a CSV file and must fail visibly offline rather than be queued
+const OUTBOX_WRITES = [
+  { method: 'POST', pattern: /\/api\/patients$/ },
+  { method: 'PUT', pattern: /\/api\/patients\/[^/]+$/ },
+  { method: 'POST', pattern: /\/api\/vital-signs$/ },
+];
+const OUTBOX_BATCH_SIZE = 500;
+
+const openOutbox = () => new Promise((resolve, reject) => {
+  const request = indexedDB.open(OUTBOX_DB, 1);
+  request.onupgradeneeded = () => {
+    request.result.createObjectStore('requests', { keyPath: 'seq', autoIncrement: true });
+  };
+  request.onsuccess = () => resolve(request.result);
+  request.onerror = () => reject(request.error);
+});
+
+const outboxTransaction = async (mode, work) => {
+  const db = await openOutbox();
+  return new Promise((resolve, reject) => {
+    const transaction = db.transaction('requests', mode);
+    const result = work(transaction.objectStore('requests'));
+    transaction.oncomplete = () => {
+      db.close();
+      resolve(result && result.result);
+    };
+    transaction.onerror = () => reject(transaction.error);
+  });
+};
+
+const isOutboxWrite = (request) => {
+  const path = new URL(request.url).pathname;
+  return OUTBOX_WRITES.some(({ method, pattern }) => method === request.method && pattern.test(path));
+};
+
+const queueWrite = async (request) => {
+  const url = new URL(request.url);
+  const entry = {
+    idempotency_key: request.headers.get('Idempotency-Key') || self.crypto.randomUUID(),
+    method: request.method,
+    path: url.pathname,
+    origin: url.origin,
+    body: await request.json()
+  };
+  await outboxTransaction('readwrite', (store) => store.add(entry));
+  if (self.registration.sync) {
+    self.registration.sync.register('outbox-replay').catch(() => {});
+  }
+  console.log('Service Worker: Queued offline write', entry.method, entry.path);
+  return new Response(JSON.stringify({ queued: true, idempotency_key: entry.idempotency_key }), {
+    status: 202,
+    headers: { 'Content-Type': 'application/json' }
+  });
+};
+
+const replayOutbox = async () => {
+  const entries = await outboxTransaction('readonly', (store) => store.getAll());
+  if (!entries || entries.length === 0) return;
+
+  const origins = [...new Set(entries.map((entry) => entry.origin))];
+  for (const origin of origins) {
+    const pending = entries.filter((entry) => entry.origin === origin);
+    for (let start = 0; start < pending.length; start += OUTBOX_BATCH_SIZE) {
+      const batch = pending.slice(start, start + OUTBOX_BATCH_SIZE);
+      const response = await fetch(`${origin}/api/outbox`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          requests: batch.map(({ idempotency_key, method, path, body }) => ({ idempotency_key, method, path, body }))
+        })
+      });
+      if (!response.ok) throw new Error(`Outbox replay failed with ${response.status}`);
+      const results = await response.json();
+      // Keep only writes whose first attempt is still running on the server;
+      // any other failure (an occupied bed, a conflicting edit) will not go
+      // away on replay, so it is dropped and reported to the open pages
+      const done = batch.filter((entry, index) => !results[index].retry);
+      await outboxTransaction('readwrite', (store) => done.forEach((entry) => store.delete(entry.seq)));
+      console.log(`Service Worker: Replayed ${done.length} offline writes`);
+      const failures = batch
+        .map((entry, index) => ({ method: entry.method, path: entry.path, ...results[index] }))
+        .filter((result) => !result.retry && result.status_code >= 400)
+        .map(({ method, path, status_code, body }) => ({ method, path, status_code, detail: body && body.detail }));
+      if (failures.length > 0) {
+        const pages = await self.clients.matchAll({ type: 'window' });
+        pages.forEach((page) => page.postMessage({ type: 'OUTBOX_FAILED', failures }));
+      }
+    }
+  }
+};
+
+// Revalidate an API read against the cached copy's ETag; a 304 answers from
+// the cache without downloading or re-parsing the body
+const revalidate = async (request) => {
+  const cached = await caches.match(request);
+  const etag = cached && cached.headers.get('ETag');
+  const headers = new Headers(request.headers);
+  if (etag) headers.set('If-None-Match', etag);
+
+  let response;
+  try {
+    response = await fetch(request.url, { headers, mode: 'cors', credentials: request.credentials });
+  } catch (error) {
+    // Fallback to cache if network fails
+    return cached;
+  }
+  if (response.status === 304 && cached) {
+    return cached;
+  }
+  if (response.ok) {
+    // Clone the response before caching
+    const responseClone = response.clone();
+    caches.open(CACHE_NAME).then((cache) => {
+      cache.put(request, responseClone);
+    });
+  }
+  return response;
+};
+
 // Install Service Worker
 self.addEventListener('install', (event) => {
   console.log('Service Worker: Installing...');
@@ -39,23 +163,24 @@ self.addEventListener('activate', (event) => {
 
 // Fetch Event - Network First Strategy for API calls, Cache First for static assets
 self.addEventListener('fetch', (event) => {
-  // Handle API requests - Network First
-  if (event.request.url.includes('/api/')) {
-    event.respondWith(
-      fetch(event.request)
-        .then((response) => {
-          // Clone the response before caching
-          const responseClone = response.clone();
-          caches.open(CACHE_NAME).then((cache) => {
-            cache.put(event.request, responseClone);
-          });
-          return response;
-        })
-        .catch(() => {
-          // Fallback to cache if network fails
-          return caches.match(event.request);
-        })
-    );
+  // Writes go to the network and fall back to the offline outbox
+  if (isOutboxWrite(event.request)) {
+    const queued = event.request.clone();
+    event.respondWith(fetch(event.request).catch(() => queueWrite(queued)));
+    return;
+  }
+  // Other writes are never cached
+  if (event.request.method !== 'GET') {
+    return;
+  }
+  // Sync deltas are applied to the IndexedDB replica and the event stream
+  // never ends, so neither goes through the response cache
+  if (event.request.url.includes('/api/sync') || event.request.url.includes('/api/stream')) {
+    return;
+  }
+  // Handle API requests - Network First, revalidating the cached copy
+  else if (event.request.url.includes('/api/')) {
+    event.respondWith(revalidate(event.request));
   }
   // Handle static assets - Cache First
   else {
@@ -76,7 +201,10 @@ self.addEventListener('fetch', (event) => {
 // Background Sync for offline data
 self.addEventListener('sync', (event) => {
   console.log('Service Worker: Background Sync', event.tag);
-  if (event.tag === 'background-sync') {
+  if (event.tag === 'outbox-replay') {
+    event.waitUntil(replayOutbox());
+  }
+  else if (event.tag === 'background-sync') {
     event.waitUntil(
       // Handle background sync operations
       console.log('Service Worker: Performing background sync')
@@ -134,6 +262,9 @@ self.addEventListener('message', (event) => {
   if (event.data && event.data.type === 'SKIP_WAITING') {
     self.skipWaiting();
   }
+  if (event.data && event.data.type === 'REPLAY_OUTBOX') {
+    event.waitUntil(replayOutbox().catch((error) => console.log('Service Worker: Outbox replay deferred', error)));
+  }
 });
 
 console.log('Service Worker: Loaded successfully for Kharki\'s Patient Tracker');
\ No newline at end of file
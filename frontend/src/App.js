@@ -1,10 +1,23 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import axios from "axios";
+import { syncReplica, readReplica } from "./replica";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Page sizes for the cursor-paginated list endpoints
+const PATIENTS_PAGE_SIZE = 200;
+const VITAL_SIGNS_PAGE_SIZE = 50;
+
+// Writes carry a client-generated Idempotency-Key so a retried or replayed
+// request is applied once; while offline the service worker queues them and
+// answers 202 with { queued: true }
+const idempotentWrite = (method, url, data) =>
+  axios({ method, url, data, headers: { 'Idempotency-Key': crypto.randomUUID() } });
+
+const wasQueued = (response) => response.status === 202 && response.data && response.data.queued;
+
 // Ward list
 const WARDS = ["Post op", "Gyne", "Ward 1", "Ward 2", "Ward 3", "Isolation room"];
 
@@ -14,6 +27,8 @@ function App() {
   const [selectedPatient, setSelectedPatient] = useState(null);
   const [patients, setPatients] = useState([]);
   const [vitalSigns, setVitalSigns] = useState([]);
+  const [patientsCursor, setPatientsCursor] = useState(null);
+  const [vitalSignsCursor, setVitalSignsCursor] = useState(null);
   const [searchQuery, setSearchQuery] = useState('');
   const [filterHighRisk, setFilterHighRisk] = useState(false);
   const [filterDischarged, setFilterDischarged] = useState('');
@@ -21,20 +36,45 @@ function App() {
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(false);
 
-  // Fetch patients
-  const fetchPatients = async () => {
+  // Fetch patients; pass the cursor of the previous page to append the next one
+  const fetchPatients = async (cursor = null, limit = PATIENTS_PAGE_SIZE) => {
     setLoading(true);
     try {
       const params = new URLSearchParams();
-      if (searchQuery) params.append('search', searchQuery);
+      if (searchQuery) {
+        params.append('search', searchQuery);
+        params.append('mode', 'prefix');
+      }
       if (filterHighRisk) params.append('high_risk', 'true');
       if (filterDischarged) params.append('discharged', filterDischarged === 'yes' ? 'true' : 'false');
       if (filterWard) params.append('ward', filterWard);
+      if (cursor) params.append('cursor', cursor);
+      params.append('limit', limit);
+      params.append('view', 'summary');
       
       const response = await axios.get(`${API}/patients?${params}`);
-      setPatients(response.data);
+      setPatients(cursor ? (previous) => [...previous, ...response.data] : response.data);
+      setPatientsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching patients:', error);
+      if (!cursor && !error.response) {
+        // Offline: show the local replica with the same filters applied
+        const { patients: replicaPatients } = await readReplica().catch(() => ({ patients: [] }));
+        // Same word-prefix matching as the server's default search mode
+        const words = (text) => (text || '').normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+        const terms = words(searchQuery);
+        setPatients(replicaPatients
+          .filter((p) => {
+            const patientWords = [p.full_name, p.patient_id, p.ward_number].flatMap(words);
+            patientWords.push(words(p.patient_id).join(''));
+            return terms.every((term) => patientWords.some((word) => word.startsWith(term)));
+          })
+          .filter((p) => !filterHighRisk || p.high_risk === 'Yes')
+          .filter((p) => !filterDischarged || p.discharged === (filterDischarged === 'yes' ? 'Yes' : 'No'))
+          .filter((p) => !filterWard || p.ward_number === filterWard)
+          .sort((a, b) => a.ward_number.localeCompare(b.ward_number)));
+        setPatientsCursor(null);
+      }
     } finally {
       setLoading(false);
     }
@@ -50,16 +90,28 @@ function App() {
     }
   };
 
-  // Fetch vital signs
-  const fetchVitalSigns = async (patientId = null) => {
+  // Fetch vital signs; pass the cursor of the previous page to append the next one
+  const fetchVitalSigns = async (patientId = null, cursor = null, limit = VITAL_SIGNS_PAGE_SIZE) => {
     try {
       const params = new URLSearchParams();
       if (patientId) params.append('patient_id', patientId);
+      if (cursor) params.append('cursor', cursor);
+      params.append('limit', limit);
+      params.append('view', 'summary');
       
-      const response = await axios.get(`${API}/vital-signs?${params}&limit=50`);
-      setVitalSigns(response.data);
+      const response = await axios.get(`${API}/vital-signs?${params}`);
+      setVitalSigns(cursor ? (previous) => [...previous, ...response.data] : response.data);
+      setVitalSignsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching vital signs:', error);
+      if (!cursor && !error.response) {
+        const { vitalSigns: replicaVitals } = await readReplica().catch(() => ({ vitalSigns: [] }));
+        setVitalSigns(replicaVitals
+          .filter((v) => !patientId || v.patient_id === patientId)
+          .sort((a, b) => b.monitoring_datetime.localeCompare(a.monitoring_datetime))
+          .slice(0, limit));
+        setVitalSignsCursor(null);
+      }
     }
   };
 
@@ -69,6 +121,70 @@ function App() {
     fetchVitalSigns();
   }, [searchQuery, filterHighRisk, filterDischarged, filterWard]);
 
+  // Keep the offline replica current: sync on load and whenever the network
+  // returns, after asking the service worker to replay queued writes
+  useEffect(() => {
+    const sync = () => {
+      if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage({ type: 'REPLAY_OUTBOX' });
+      }
+      syncReplica().catch((error) => console.error('Error syncing replica:', error));
+    };
+    // Queued writes the server rejected on replay are dropped from the outbox
+    const reportFailures = (event) => {
+      if (!event.data || event.data.type !== 'OUTBOX_FAILED') return;
+      const lines = event.data.failures.map((failure) =>
+        `${failure.method} ${failure.path}: ${typeof failure.detail === 'string' ? failure.detail : `error ${failure.status_code}`}`
+      );
+      alert(`Some changes made offline could not be saved:\n${lines.join('\n')}`);
+    };
+    sync();
+    window.addEventListener('online', sync);
+    if (navigator.serviceWorker) navigator.serviceWorker.addEventListener('message', reportFailures);
+    return () => {
+      window.removeEventListener('online', sync);
+      if (navigator.serviceWorker) navigator.serviceWorker.removeEventListener('message', reportFailures);
+    };
+  }, []);
+
+  // Live updates from other devices: vitals are applied in place, patient
+  // changes refetch the (filtered) list, and stats refresh at most once a second
+  const liveRefresh = useRef({});
+  liveRefresh.current = { fetchPatients, fetchStats };
+
+  useEffect(() => {
+    const params = new URLSearchParams();
+    if (filterWard) params.append('ward', filterWard);
+    const source = new EventSource(`${API}/stream?${params}`);
+    const timers = {};
+    const debounced = (name) => {
+      clearTimeout(timers[name]);
+      timers[name] = setTimeout(() => liveRefresh.current[name](), 1000);
+    };
+
+    source.addEventListener('vital_signs.created', (event) => {
+      const vital = JSON.parse(event.data);
+      setVitalSigns((previous) => previous.some((v) => v.id === vital.id) ? previous : [vital, ...previous]);
+      debounced('fetchStats');
+    });
+    source.addEventListener('vital_signs.deleted', (event) => {
+      const { id } = JSON.parse(event.data);
+      setVitalSigns((previous) => previous.filter((v) => v.id !== id));
+      debounced('fetchStats');
+    });
+    ['patient.created', 'patient.updated', 'patient.deleted'].forEach((type) => {
+      source.addEventListener(type, () => {
+        debounced('fetchPatients');
+        debounced('fetchStats');
+      });
+    });
+
+    return () => {
+      Object.values(timers).forEach(clearTimeout);
+      source.close();
+    };
+  }, [filterWard]);
+
   // Navigation Component
   const Navigation = () => (
     <nav className="bg-blue-600 text-white p-4 shadow-lg">
@@ -240,8 +356,20 @@ function App() {
                   Log Vitals
                 </button>
                 <button 
-                  onClick={() => {
-                    setSelectedPatient(patient);
+                  onClick={async () => {
+                    // The list only carries summary fields; edit the full record,
+                    // from the local replica when offline, never the summary row
+                    const response = await axios.get(`${API}/patients/${patient.id}`).catch(() => null);
+                    let fullPatient = response && response.data;
+                    if (!fullPatient) {
+                      const { patients: replicaPatients } = await readReplica().catch(() => ({ patients: [] }));
+                      fullPatient = replicaPatients.find((p) => p.id === patient.id);
+                    }
+                    if (!fullPatient) {
+                      alert('Could not load the full patient record. Please try again when online.');
+                      return;
+                    }
+                    setSelectedPatient(fullPatient);
                     setCurrentView('edit-patient');
                   }}
                   className="flex-1 bg-gray-600 text-white px-4 py-2 rounded hover:bg-gray-700 text-sm"
@@ -253,6 +381,17 @@ function App() {
           ))}
         </div>
       )}
+
+      {!loading && patientsCursor && (
+        <div className="mt-6 text-center">
+          <button
+            onClick={() => fetchPatients(patientsCursor)}
+            className="bg-gray-600 text-white px-4 py-2 rounded hover:bg-gray-700"
+          >
+            Load More Patients
+          </button>
+        </div>
+      )}
     </div>
   );
 
@@ -275,8 +414,8 @@ function App() {
       e.preventDefault();
       setLoading(true);
       try {
-        await axios.post(`${API}/patients`, formData);
-        alert('Patient added successfully!');
+        const response = await idempotentWrite('post', `${API}/patients`, formData);
+        alert(wasQueued(response) ? 'You are offline. The patient will be added when the connection returns.' : 'Patient added successfully!');
         setFormData({
           patient_id: '',
           full_name: '',
@@ -440,7 +579,7 @@ function App() {
 
   // Edit Patient Form Component
   const EditPatientForm = () => {
-    const [formData, setFormData] = useState({
+    const initialData = {
       full_name: selectedPatient?.full_name || '',
       address: selectedPatient?.address || '',
       ward_number: selectedPatient?.ward_number || '',
@@ -450,14 +589,20 @@ function App() {
       high_risk: selectedPatient?.high_risk || 'No',
       discharged: selectedPatient?.discharged || 'No',
       notes: selectedPatient?.notes || ''
-    });
+    };
+    const [formData, setFormData] = useState(initialData);
 
     const handleSubmit = async (e) => {
       e.preventDefault();
       setLoading(true);
       try {
-        await axios.put(`${API}/patients/${selectedPatient.id}`, formData);
-        alert('Patient updated successfully!');
+        // Send only the fields the user changed, so a queued offline edit
+        // never overwrites values changed elsewhere in the meantime
+        const changes = Object.fromEntries(
+          Object.entries(formData).filter(([field, value]) => value !== initialData[field])
+        );
+        const response = await idempotentWrite('put', `${API}/patients/${selectedPatient.id}`, changes);
+        alert(wasQueued(response) ? 'You are offline. The update will be saved when the connection returns.' : 'Patient updated successfully!');
         fetchPatients();
         fetchStats();
         setCurrentView('patients');
@@ -671,8 +816,8 @@ function App() {
           urine_output: formData.urine_output ? parseInt(formData.urine_output) : null
         };
 
-        await axios.post(`${API}/vital-signs`, submitData);
-        alert('Vital signs recorded successfully!');
+        const response = await idempotentWrite('post', `${API}/vital-signs`, submitData);
+        alert(wasQueued(response) ? 'You are offline. The vital signs will be recorded when the connection returns.' : 'Vital signs recorded successfully!');
         setFormData({
           patient_id: selectedPatient?.id || '',
           monitoring_datetime: new Date().toISOString().slice(0, 16),
@@ -1034,6 +1179,17 @@ function App() {
           </table>
         </div>
       </div>
+
+      {vitalSignsCursor && (
+        <div className="mt-6 text-center">
+          <button
+            onClick={() => fetchVitalSigns(null, vitalSignsCursor)}
+            className="bg-gray-600 text-white px-4 py-2 rounded hover:bg-gray-700"
+          >
+            Load More Vital Signs
+          </button>
+        </div>
+      )}
     </div>
   );
 
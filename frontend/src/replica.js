@@ -0,0 +1,90 @@
+import axios from "axios";
+
+// Local IndexedDB replica of patients and vital signs. It is kept current
+// with GET /api/sync deltas, so reconnecting only downloads what changed,
+// and it backs the patient and vital-sign lists while offline.
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const DB_NAME = 'kharkis-patient-tracker-replica';
+const DB_VERSION = 1;
+
+const openReplica = () => new Promise((resolve, reject) => {
+  const request = indexedDB.open(DB_NAME, DB_VERSION);
+  request.onupgradeneeded = () => {
+    const db = request.result;
+    db.createObjectStore('patients', { keyPath: 'id' });
+    db.createObjectStore('vital_signs', { keyPath: 'id' }).createIndex('patient_id', 'patient_id');
+    db.createObjectStore('meta');
+  };
+  request.onsuccess = () => resolve(request.result);
+  request.onerror = () => reject(request.error);
+});
+
+const requestResult = (request) => new Promise((resolve, reject) => {
+  request.onsuccess = () => resolve(request.result);
+  request.onerror = () => reject(request.error);
+});
+
+const transactionDone = (transaction) => new Promise((resolve, reject) => {
+  transaction.oncomplete = () => resolve();
+  transaction.onerror = () => reject(transaction.error);
+  transaction.onabort = () => reject(transaction.error);
+});
+
+const applyDelta = async (db, delta) => {
+  const transaction = db.transaction(['patients', 'vital_signs', 'meta'], 'readwrite');
+  const patients = transaction.objectStore('patients');
+  const vitalSigns = transaction.objectStore('vital_signs');
+
+  if (delta.reset) {
+    patients.clear();
+    vitalSigns.clear();
+  }
+  delta.patients.forEach((patient) => patients.put(patient));
+  delta.vital_signs.forEach((vital) => vitalSigns.put(vital));
+  delta.deleted.vital_signs.forEach((id) => vitalSigns.delete(id));
+  delta.deleted.patients.forEach((id) => {
+    patients.delete(id);
+    vitalSigns.index('patient_id').openKeyCursor(IDBKeyRange.only(id)).onsuccess = (event) => {
+      const cursor = event.target.result;
+      if (cursor) {
+        vitalSigns.delete(cursor.primaryKey);
+        cursor.continue();
+      }
+    };
+  });
+  transaction.objectStore('meta').put(delta.next_token, 'sync_token');
+  await transactionDone(transaction);
+};
+
+// Pull every change since the stored token and apply it to the replica
+export const syncReplica = async () => {
+  const db = await openReplica();
+  try {
+    let token = await requestResult(db.transaction('meta').objectStore('meta').get('sync_token'));
+    let hasMore = true;
+    while (hasMore) {
+      const params = new URLSearchParams();
+      if (token) params.append('since', token);
+      const response = await axios.get(`${API}/sync?${params}`);
+      await applyDelta(db, response.data);
+      token = response.data.next_token;
+      hasMore = response.data.has_more;
+    }
+  } finally {
+    db.close();
+  }
+};
+
+export const readReplica = async () => {
+  const db = await openReplica();
+  try {
+    const transaction = db.transaction(['patients', 'vital_signs']);
+    const [patients, vitalSigns] = await Promise.all([
+      requestResult(transaction.objectStore('patients').getAll()),
+      requestResult(transaction.objectStore('vital_signs').getAll()),
+    ]);
+    return { patients, vitalSigns };
+  } finally {
+    db.close();
+  }
+};
@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+class NoSession:
+    """mongomock has no sessions; server code only uses them as context managers."""
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class StandaloneTopology:
+    topology_type_name = "Single"
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An in-memory database injected in place of the Motor client."""
+    mock = AsyncMongoMockClient()
+
+    async def start_session(**kwargs):
+        return NoSession()
+
+    mock.start_session = start_session
+    mock.topology_description = StandaloneTopology()
+    monkeypatch.setattr(server, "client", mock)
+    monkeypatch.setattr(server, "db", mock["test_database"])
+    monkeypatch.setattr(server, "replica_db", mock["test_database"])
+    return mock["test_database"]
+
+
+@pytest.fixture
+def patient_form():
+    """Builds the JSON body of a new patient; fields override the defaults."""
+    def build(patient_id, bed_number, ward_number="W1", **fields):
+        return {
+            "patient_id": patient_id,
+            "full_name": f"Name {patient_id}",
+            "birthdate": "1990-01-01",
+            "address": "1 Main Street",
+            "ward_number": ward_number,
+            "bed_number": bed_number,
+            "admission_date": "2025-01-01",
+            "diagnosis": "Observation",
+            **fields,
+        }
+    return build
+
+
+@pytest.fixture
+def vitals_form():
+    """Builds the JSON body of a vital-signs reading; fields override the defaults."""
+    def build(patient_db_id, monitoring_datetime="2025-01-01T10:00:00", **fields):
+        return {
+            "patient_id": patient_db_id,
+            "monitoring_datetime": monitoring_datetime,
+            "blood_pressure": "120/80",
+            "heart_rate": 70,
+            "temperature": 37.0,
+            "respiratory_rate": 16,
+            "spo2": 98,
+            "pain_score": 1,
+            **fields,
+        }
+    return build
+
+
+@pytest.fixture
+def api(mongo):
+    with TestClient(server.app) as client:
+        yield client
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import analytics
+
+START = datetime(2025, 1, 1)
+END = START + timedelta(hours=72)
+
+
+def columns(readings):
+    """Store-style columns for readings given as dicts of the fields they set."""
+    return {field: [reading.get(field) for reading in readings] for field in analytics.COLUMNS}
+
+
+def reading(patient_id, hour, **fields):
+    return {
+        "patient_id": patient_id,
+        "patient_name": f"Patient {patient_id}",
+        "monitoring_datetime": START + timedelta(hours=hour),
+        **fields,
+    }
+
+
+def trends_by_patient(readings, window_hours=6, ranges=None):
+    trends = analytics.vitals_trends(columns(readings), START, END, window_hours, ranges or {})
+    return {patient["patient_id"]: patient for patient in trends["patients"]}
+
+
+def test_rolling_means_stay_within_each_patient_across_different_time_spans():
+    readings = [reading("A", hour, heart_rate=100) for hour in range(60)]
+    readings.append(reading("B", 1, heart_rate=50))
+    readings += [reading("C", hour, heart_rate=70 + hour) for hour in (0, 30, 31)]
+
+    patients = trends_by_patient(readings)
+
+    assert patients["A"]["rolling_mean"]["heart_rate"].tolist() == [100.0] * 60
+    assert patients["B"]["rolling_mean"]["heart_rate"].tolist() == [50.0]
+    assert patients["C"]["rolling_mean"]["heart_rate"].tolist() == [70.0, 100.0, 100.5]
+
+
+def test_rolling_means_skip_missing_values():
+    readings = [reading("A", 0, spo2=96), reading("A", 1), reading("A", 2, spo2=98)]
+
+    means = trends_by_patient(readings)["A"]["rolling_mean"]["spo2"]
+
+    assert means.tolist() == [96.0, 96.0, 97.0]
+
+
+def test_slopes_per_hour_are_per_patient_least_squares():
+    readings = [reading("A", hour, temperature=36.0 + 0.5 * hour) for hour in range(5)]
+    readings += [reading("B", 10, temperature=37.0)]
+
+    patients = trends_by_patient(readings)
+
+    assert patients["A"]["slope_per_hour"]["temperature"] == pytest.approx(0.5)
+    assert np.isnan(patients["B"]["slope_per_hour"]["temperature"])
+
+
+def test_out_of_range_counts_use_half_open_bands():
+    ranges = {"heart_rate": [(None, 50), (100, None)]}
+    readings = [reading("A", hour, heart_rate=rate) for hour, rate in enumerate((49, 50, 99, 100, 130))]
+
+    patient = trends_by_patient(readings, ranges=ranges)["A"]
+
+    assert patient["out_of_range"] == {"heart_rate": 3}
+
+
+def test_fluid_balance_counts_iv_and_millilitres_of_oral_intake():
+    readings = [
+        reading("A", 1, iv_fluids_volume=100, oral_intake="water 200 ml", urine_output=150),
+        reading("A", 2, oral_intake="50% of meal", urine_output=50),
+        reading("A", 7, oral_intake="tea 150ml"),
+    ]
+
+    fluids = trends_by_patient(readings)["A"]["fluid_balance"]
+
+    assert (fluids["intake_ml"], fluids["output_ml"], fluids["balance_ml"]) == (450.0, 200.0, 250.0)
+    assert fluids["intervals"]["start"].tolist() == [START, START + timedelta(hours=6)]
+    assert fluids["intervals"]["balance_ml"].tolist() == [100.0, 150.0]
+
+
+def test_blood_pressure_is_parsed_when_not_stored():
+    readings = [reading("A", 0, blood_pressure="150/95"), reading("A", 1, blood_pressure="120/80", systolic_bp=120, diastolic_bp=80)]
+
+    latest = trends_by_patient(readings)["A"]["rolling_mean"]
+
+    assert latest["systolic_bp"].tolist() == [150.0, 135.0]
+    assert latest["diastolic_bp"].tolist() == [95.0, 87.5]
+
+
+def test_readings_outside_the_period_are_ignored():
+    readings = [reading("A", -1, heart_rate=200), reading("A", 72, heart_rate=200), reading("A", 10, heart_rate=80)]
+
+    patient = trends_by_patient(readings)["A"]
+
+    assert patient["readings"] == 1
+    assert patient["latest"]["heart_rate"] == 80.0
+
+
+def test_no_readings_returns_no_patients():
+    assert analytics.vitals_trends(columns([]), START, END, 6, {})["patients"] == []
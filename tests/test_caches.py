@@ -0,0 +1,28 @@
+import asyncio
+
+import server
+
+
+def test_stats_cache_keeps_one_entry_per_key_across_versions():
+    cache = server.TTLCache(60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        results = [await cache.get_or_compute("overview", compute, version=f"v{i}") for i in range(5)]
+        results.append(await cache.get_or_compute("overview", compute, version="v4"))
+        return results
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 4, 5, 5]
+    assert len(cache._entries) == 1
+
+
+def test_overview_stats_are_recomputed_after_a_write(api, patient_form):
+    assert api.get("/api/stats/overview").json()["total_patients"] == 0
+
+    api.post("/api/patients", json=patient_form("P1", "1"))
+
+    assert api.get("/api/stats/overview").json()["total_patients"] == 1
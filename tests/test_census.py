@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+
+
+def occupied_beds(api, ward_number="W1"):
+    census = api.get(f"/api/wards/{ward_number}/census").json()
+    return [(bed["bed_number"], bed["patient_id"]) for bed in census["beds"]]
+
+
+def test_admission_claims_its_bed(api, patient_form):
+    assert api.post("/api/patients", json=patient_form("P1", "1")).status_code == 200
+
+    taken = api.post("/api/patients", json=patient_form("P2", "1"))
+
+    assert taken.status_code == 409
+    assert taken.json()["detail"] == "Bed 1 in ward W1 is already occupied by Name P1 (P1)"
+    assert api.post("/api/patients", json=patient_form("P2", "2")).status_code == 200
+    assert occupied_beds(api) == [("1", "P1"), ("2", "P2")]
+
+
+def test_discharged_patients_hold_no_bed(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+
+    assert api.post("/api/patients", json=patient_form("P2", "1", discharged="Yes")).status_code == 200
+    assert occupied_beds(api) == [("1", "P1")]
+
+
+def test_discharge_releases_the_bed(api, patient_form):
+    first = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    second = api.post("/api/patients", json=patient_form("P2", "2")).json()
+
+    assert api.put(f"/api/patients/{first['id']}", json={"discharged": "Yes"}).status_code == 200
+    assert api.put(f"/api/patients/{second['id']}", json={"bed_number": "1"}).status_code == 200
+    assert occupied_beds(api) == [("1", "P2")]
+
+
+def test_delete_releases_the_bed(api, patient_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+
+    assert api.delete(f"/api/patients/{patient['id']}").status_code == 200
+    assert occupied_beds(api) == []
+    assert api.post("/api/patients", json=patient_form("P2", "1")).status_code == 200
+
+
+def test_import_rejects_taken_and_repeated_beds(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+
+    report = api.post("/api/patients/import", json=[
+        patient_form("B1", "1"), patient_form("B2", "5"), patient_form("B3", "5"),
+    ]).json()
+
+    assert report["inserted"] == 1
+    assert [error["index"] for error in report["errors"]] == [0, 2]
+    assert occupied_beds(api) == [("1", "P1"), ("5", "B2")]
+
+
+def test_rebuild_gives_a_shared_bed_to_the_latest_update(api, mongo, patient_form):
+    asyncio.run(mongo.patients.insert_many([
+        {
+            "id": f"id-{i}", "patient_id": f"P{i}", "full_name": f"Name P{i}", "ward_number": "W1",
+            "bed_number": bed, "admission_date": datetime(2025, 1, 1), "high_risk": "No", "discharged": "No",
+            "updated_at": datetime(2025, 1, 1 + i),
+        }
+        for i, bed in enumerate(["1", "1", "2", "3", "4"])
+    ]))
+
+    assert asyncio.run(server.rebuild_ward_census()) == 4
+    assert occupied_beds(api) == [("1", "P1"), ("2", "P2"), ("3", "P3"), ("4", "P4")]
+    # Small batches split the shared bed's patients across inserts
+    assert asyncio.run(server.rebuild_ward_census(batch_size=2)) == 4
+    # The rebuilt census carries the unique bed index
+    assert api.post("/api/patients", json=patient_form("P5", "2")).status_code == 409
+
+
+def test_rebuild_waits_for_the_lease_and_keeps_the_census(api, mongo, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+    asyncio.run(mongo.census_rebuilds.update_one(
+        {"_id": server.CENSUS_REBUILD_ID}, {"$set": {"lease_until": datetime.utcnow() + timedelta(minutes=1)}}, upsert=True
+    ))
+
+    assert asyncio.run(server.rebuild_ward_census()) is None
+    assert occupied_beds(api) == [("1", "P1")]
+    assert api.post("/api/patients", json=patient_form("P2", "1")).status_code == 409
+
+
+def test_rebuild_reapplies_writes_made_while_it_ran(api, mongo, patient_form):
+    moved = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    deleted = api.post("/api/patients", json=patient_form("P2", "2")).json()
+    started = datetime.utcnow()
+    api.put(f"/api/patients/{moved['id']}", json={"bed_number": "3"})
+    api.delete(f"/api/patients/{deleted['id']}")
+    # The rebuilt census still holds both patients where its scan found them
+    for patient_db_id, patient_id, bed_number in ((moved["id"], "P1", "1"), (deleted["id"], "P2", "2")):
+        asyncio.run(mongo.ward_census.replace_one(
+            {"_id": patient_db_id},
+            {"patient_id": patient_id, "full_name": f"Name {patient_id}", "ward_number": "W1", "bed_number": bed_number},
+            upsert=True
+        ))
+
+    asyncio.run(server.reapply_census_writes(started))
+
+    assert occupied_beds(api) == [("3", "P1")]
+
+
+def test_first_start_builds_the_census_once(mongo):
+    asyncio.run(mongo.patients.insert_one({
+        "id": "id-1", "patient_id": "P1", "full_name": "Name P1", "ward_number": "W1", "bed_number": "1",
+        "admission_date": datetime(2025, 1, 1), "high_risk": "No", "discharged": "No", "updated_at": datetime(2025, 1, 1),
+    }))
+
+    assert asyncio.run(server.ensure_ward_census()) == 1
+    asyncio.run(mongo.ward_census.delete_many({}))
+    assert asyncio.run(server.ensure_ward_census()) == 0
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def mark_pending(mongo, key):
+    asyncio.run(mongo.idempotency_keys.update_one({"key": key}, {"$set": {"status": "pending"}}))
+
+
+def test_retry_replays_the_stored_result(api, mongo, patient_form):
+    first = api.post("/api/patients", json=patient_form("P1", "1"), headers={"Idempotency-Key": "key-1"})
+    retried = api.post("/api/patients", json=patient_form("P1", "1"), headers={"Idempotency-Key": "key-1"})
+
+    assert (first.status_code, retried.status_code) == (200, 200)
+    assert retried.json()["id"] == first.json()["id"]
+    assert asyncio.run(mongo.patients.count_documents({})) == 1
+
+
+def test_key_reused_for_a_different_request_is_422(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"), headers={"Idempotency-Key": "key-1"})
+
+    reused = api.post("/api/patients", json=patient_form("P2", "2"), headers={"Idempotency-Key": "key-1"})
+
+    assert reused.status_code == 422
+
+
+def test_in_progress_idempotency_key_answers_retry_after(api, mongo, patient_form):
+    form = patient_form("P1", "1")
+    assert api.post("/api/patients", json=form, headers={"Idempotency-Key": "key-1"}).status_code == 200
+    mark_pending(mongo, "key-1")
+
+    retried = api.post("/api/patients", json=form, headers={"Idempotency-Key": "key-1"})
+
+    assert retried.status_code == 409
+    assert retried.headers["Retry-After"] == "1"
+
+
+def test_outbox_marks_only_in_progress_writes_for_retry(api, mongo, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"), headers={"Idempotency-Key": "key-1"})
+    mark_pending(mongo, "key-1")
+
+    results = api.post("/api/outbox", json={"requests": [
+        {"idempotency_key": "key-1", "method": "POST", "path": "/api/patients", "body": patient_form("P1", "1")},
+        {"idempotency_key": "key-2", "method": "POST", "path": "/api/patients", "body": patient_form("P2", "1")},
+        {"idempotency_key": "key-3", "method": "POST", "path": "/api/patients", "body": patient_form("P3", "3")},
+    ]}).json()
+
+    assert [(result["status_code"], result["retry"]) for result in results] == [(409, True), (409, False), (200, False)]
+
+
+def run_with_key(key, action, payload=None):
+    return server.with_idempotency(key, "POST /test", payload or server.PatientUpdate(notes="Checked"), action)
+
+
+def test_stale_pending_key_is_taken_over(api, mongo, patient_form):
+    form = patient_form("P1", "1")
+    first = api.post("/api/patients", json=form, headers={"Idempotency-Key": "key-1"}).json()
+    # As if the first attempt's worker crashed before its write landed
+    api.delete(f"/api/patients/{first['id']}")
+    asyncio.run(mongo.idempotency_keys.update_one(
+        {"key": "key-1"}, {"$set": {"status": "pending", "owner": "crashed", "created_at": datetime(2025, 1, 1)}}
+    ))
+
+    retried = api.post("/api/patients", json=form, headers={"Idempotency-Key": "key-1"})
+
+    assert retried.status_code == 200
+    record = asyncio.run(mongo.idempotency_keys.find_one({"key": "key-1"}))
+    assert (record["status"], record["response"]["id"]) == ("completed", retried.json()["id"])
+    assert record["owner"] != "crashed"
+
+
+def test_running_request_keeps_its_key_past_the_timeout(api, monkeypatch):
+    monkeypatch.setattr(server, "IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 0.2)
+    runs = []
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        runs.append("slow")
+        return {"ok": True}
+
+    async def fast():
+        runs.append("fast")
+        return {"ok": True}
+
+    async def scenario():
+        first = asyncio.create_task(run_with_key("key-1", slow))
+        await asyncio.sleep(0.35)
+        with pytest.raises(HTTPException) as retry:
+            await run_with_key("key-1", fast)
+        return retry.value.status_code, await first
+
+    assert asyncio.run(scenario()) == (409, {"ok": True})
+    assert runs == ["slow"]
+
+
+def test_request_that_lost_its_key_is_cancelled(api, mongo, monkeypatch):
+    monkeypatch.setattr(server, "IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 0.2)
+    runs = []
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        runs.append("slow")
+        return {"ok": True}
+
+    async def scenario():
+        first = asyncio.create_task(run_with_key("key-1", slow))
+        await asyncio.sleep(0.01)
+        await mongo.idempotency_keys.update_one({"key": "key-1"}, {"$set": {"owner": "retry"}})
+        with pytest.raises(HTTPException) as lost:
+            await first
+        return lost.value.status_code
+
+    assert asyncio.run(scenario()) == 409
+    assert runs == []
+    assert asyncio.run(mongo.idempotency_keys.find_one({"key": "key-1"}))["owner"] == "retry"
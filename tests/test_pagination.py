@@ -0,0 +1,83 @@
+import pytest
+
+import server
+
+
+def follow_pages(api, path, **params):
+    pages = []
+    while True:
+        response = api.get(path, params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+        params["cursor"] = cursor
+
+
+def test_patient_pages_follow_ward_then_id_across_ties(api, patient_form):
+    for index, ward_number in enumerate(["W2", "W1", "W1", "W2", "W1", "W1", "W2"]):
+        api.post("/api/patients", json=patient_form(f"P{index}", str(index), ward_number=ward_number))
+
+    pages = follow_pages(api, "/api/patients", limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    listed = [(patient["ward_number"], patient["id"]) for page in pages for patient in page]
+    assert listed == sorted(listed)
+    assert len(set(listed)) == 7
+
+
+def test_patient_page_that_fills_exactly_has_no_next_cursor(api, patient_form):
+    for index in range(3):
+        api.post("/api/patients", json=patient_form(f"P{index}", str(index)))
+
+    assert [len(page) for page in follow_pages(api, "/api/patients", limit=3)] == [3]
+
+
+def test_filtered_patient_pages(api, patient_form):
+    for index, ward_number in enumerate(["W1", "W2", "W1", "W1"]):
+        api.post("/api/patients", json=patient_form(f"P{index}", str(index), ward_number=ward_number))
+
+    pages = follow_pages(api, "/api/patients", ward="W1", limit=2)
+
+    assert [len(page) for page in pages] == [2, 1]
+    listed = [patient for page in pages for patient in page]
+    assert [patient["id"] for patient in listed] == sorted(patient["id"] for patient in listed)
+    assert {patient["patient_id"] for patient in listed} == {"P0", "P2", "P3"}
+
+
+def test_vital_sign_pages_follow_time_then_id_across_ties(api, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    for moment in ["2025-01-01T10:00:00"] * 4 + ["2025-01-01T11:00:00", "2025-01-01T09:00:00"]:
+        api.post("/api/vital-signs", json=vitals_form(patient["id"], moment))
+
+    pages = follow_pages(api, "/api/vital-signs", limit=4)
+
+    assert [len(page) for page in pages] == [4, 2]
+    listed = [(reading["monitoring_datetime"], reading["id"]) for page in pages for reading in page]
+    assert listed == sorted(listed, reverse=True)
+    assert len(set(listed)) == 6
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    server.encode_cursor([]),
+    server.encode_cursor(["W1"]),
+    server.encode_cursor(["W1", "id", "extra"]),
+    server.encode_cursor([{"$regex": "^"}, ""]),
+    server.encode_cursor(["W1", {"$gt": ""}]),
+    server.encode_cursor([["W1"], ""]),
+    server.encode_cursor([None, ""]),
+    server.encode_cursor([True, ""]),
+])
+def test_invalid_patient_cursor_is_400(api, cursor):
+    assert api.get("/api/patients", params={"cursor": cursor}).status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    server.encode_cursor(["yesterday", "id"]),
+    server.encode_cursor([{"$regex": "^"}, ""]),
+    server.encode_cursor(["2025-01-01T10:00:00", {"$ne": None}]),
+])
+def test_invalid_vital_signs_cursor_is_400(api, cursor):
+    assert api.get("/api/vital-signs", params={"cursor": cursor}).status_code == 400
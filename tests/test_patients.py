@@ -0,0 +1,63 @@
+import asyncio
+
+
+def stored_patient(mongo, patient_db_id):
+    return asyncio.run(mongo.patients.find_one({"id": patient_db_id}))
+
+
+def test_update_of_missing_patient_is_404(api):
+    assert api.put("/api/patients/missing", json={"full_name": "Nobody"}).status_code == 404
+    assert api.put("/api/patients/missing", json={"notes": "Nobody"}).status_code == 404
+
+
+def test_update_into_a_taken_bed_is_409_and_keeps_the_patient(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+    patient = api.post("/api/patients", json=patient_form("P2", "2")).json()
+
+    moved = api.put(f"/api/patients/{patient['id']}", json={"bed_number": "1", "full_name": "Renamed"})
+
+    assert moved.status_code == 409
+    kept = api.get(f"/api/patients/{patient['id']}").json()
+    assert (kept["bed_number"], kept["full_name"]) == ("2", "Name P2")
+
+
+def test_partial_update_keeps_the_fields_it_omits(api, mongo, patient_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+
+    updated = api.put(f"/api/patients/{patient['id']}", json={"full_name": "Ann Lee"})
+
+    assert updated.status_code == 200
+    assert (updated.json()["full_name"], updated.json()["bed_number"]) == ("Ann Lee", "1")
+    assert "lee" in stored_patient(mongo, patient["id"])["search_prefixes"]
+
+
+def test_resubmitted_unchanged_fields_keep_search_and_census(api, mongo, patient_form):
+    form = patient_form("P1", "1")
+    patient = api.post("/api/patients", json=form).json()
+    before = stored_patient(mongo, patient["id"])
+
+    updated = api.put(f"/api/patients/{patient['id']}", json={**form, "notes": "Comfortable overnight"})
+
+    assert updated.status_code == 200
+    after = stored_patient(mongo, patient["id"])
+    assert after["notes"] == "Comfortable overnight"
+    assert after["search_prefixes"] == before["search_prefixes"]
+    assert [(bed["bed_number"], bed["patient_id"]) for bed in api.get("/api/wards/W1/census").json()["beds"]] == [("1", "P1")]
+
+
+def test_update_conflicting_with_a_concurrent_change_is_409(api, mongo, patient_form, monkeypatch):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    collection_class = type(mongo.patients)
+    find_one = collection_class.find_one
+
+    async def find_then_change_ward(self, *args, **kwargs):
+        found = await find_one(self, *args, **kwargs)
+        await mongo.patients.update_one({"id": patient["id"], "ward_number": "W1"}, {"$set": {"ward_number": "W9"}})
+        return found
+
+    monkeypatch.setattr(collection_class, "find_one", find_then_change_ward)
+
+    renamed = api.put(f"/api/patients/{patient['id']}", json={"full_name": "Renamed"})
+
+    assert renamed.status_code == 409
+    assert stored_patient(mongo, patient["id"])["full_name"] == "Name P1"
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import server
+
+
+def stored_patient(mongo, patient_db_id):
+    return asyncio.run(mongo.patients.find_one({"id": patient_db_id}))
+
+
+def wait_for_propagation(mongo, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while asyncio.run(mongo.vitals_propagations.count_documents({})):
+        assert time.monotonic() < deadline, "vital signs propagation did not finish"
+        time.sleep(0.01)
+
+
+def test_unchanged_edit_does_not_trigger_propagation(api, mongo, patient_form, vitals_form):
+    form = patient_form("P1", "1")
+    patient = api.post("/api/patients", json=form).json()
+    api.post("/api/vital-signs", json=vitals_form(patient["id"]))
+    edit = {field: form[field] for field in ("full_name", "ward_number", "bed_number", "address", "diagnosis")}
+
+    updated = api.put(f"/api/patients/{patient['id']}", json={**edit, "notes": "Comfortable overnight"})
+
+    assert updated.status_code == 200
+    assert stored_patient(mongo, patient["id"]).get("meta_version", 0) == 0
+    assert asyncio.run(mongo.vitals_propagations.count_documents({})) == 0
+
+
+def test_edit_of_other_fields_does_not_trigger_propagation(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    api.post("/api/vital-signs", json=vitals_form(patient["id"]))
+
+    assert api.put(f"/api/patients/{patient['id']}", json={"high_risk": "Yes"}).status_code == 200
+
+    assert stored_patient(mongo, patient["id"]).get("meta_version", 0) == 0
+
+
+def test_move_propagates_to_vital_signs(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    reading = api.post("/api/vital-signs", json=vitals_form(patient["id"])).json()
+
+    assert api.put(f"/api/patients/{patient['id']}", json={"ward_number": "W2", "bed_number": "9"}).status_code == 200
+    wait_for_propagation(mongo)
+
+    stored = stored_patient(mongo, patient["id"])
+    assert (stored["meta_version"], stored["vitals_meta_version"]) == (1, 1)
+    copied = api.get(f"/api/vital-signs/{reading['id']}").json()
+    assert (copied["ward_number"], copied["bed_number"]) == ("W2", "9")
+
+
+def test_rename_reaches_synced_vital_signs(api, mongo, patient_form, vitals_form, monkeypatch):
+    # Without the overlap window only rewritten readings are resent
+    monkeypatch.setattr(server, "SYNC_OVERLAP_SECONDS", 0)
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    reading = api.post("/api/vital-signs", json=vitals_form(patient["id"])).json()
+    token = api.get("/api/sync").json()["next_token"]
+    time.sleep(0.01)
+
+    api.put(f"/api/patients/{patient['id']}", json={"full_name": "Ann Lee"})
+    wait_for_propagation(mongo)
+
+    synced = api.get("/api/sync", params={"since": token}).json()["vital_signs"]
+    assert [(vital_signs["id"], vital_signs["patient_name"]) for vital_signs in synced] == [(reading["id"], "Ann Lee")]
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+
+RED, YELLOW = server.TriggerLevel.RED, server.TriggerLevel.YELLOW
+
+
+@pytest.mark.parametrize("parameter, value, level", [
+    ("temperature", 34.9, RED), ("temperature", 35, YELLOW), ("temperature", 35.9, YELLOW),
+    ("temperature", 36, None), ("temperature", 37.9, None), ("temperature", 38, RED),
+    ("systolic_bp", 89, RED), ("systolic_bp", 90, YELLOW), ("systolic_bp", 99, YELLOW), ("systolic_bp", 100, None),
+    ("systolic_bp", 149, None), ("systolic_bp", 150, YELLOW), ("systolic_bp", 159, YELLOW), ("systolic_bp", 160, RED),
+    ("diastolic_bp", 89, None), ("diastolic_bp", 90, YELLOW), ("diastolic_bp", 99, YELLOW), ("diastolic_bp", 100, RED),
+    ("spo2", 94, RED), ("spo2", 95, None),
+    ("respiratory_rate", 9, RED), ("respiratory_rate", 10, None), ("respiratory_rate", 20, None),
+    ("respiratory_rate", 21, YELLOW), ("respiratory_rate", 29, YELLOW), ("respiratory_rate", 30, RED),
+    ("heart_rate", 39, RED), ("heart_rate", 40, YELLOW), ("heart_rate", 49, YELLOW), ("heart_rate", 50, None),
+    ("heart_rate", 99, None), ("heart_rate", 100, YELLOW), ("heart_rate", 119, YELLOW), ("heart_rate", 120, RED),
+])
+def test_band_edges(parameter, value, level):
+    assert server.early_warning_triggers({parameter: value}).get(parameter) == level
+
+
+def test_score_adds_two_per_red_and_one_per_yellow_trigger():
+    reading = server.score_reading({
+        "blood_pressure": "150/80", "temperature": 38.2, "heart_rate": 72, "respiratory_rate": 16, "spo2": 98,
+    })
+
+    assert reading["ews_triggers"] == {"temperature": RED, "systolic_bp": YELLOW}
+    assert reading["ews_score"] == 3
+
+
+@pytest.mark.parametrize("value, parsed", [
+    ("120/80", (120, 80)), (" 120 / 80 ", (120, 80)), ("90/60", (90, 60)),
+    (None, (None, None)), ("", (None, None)), ("120", (None, None)), ("120/", (None, None)),
+    ("/80", (None, None)), ("abc/80", (None, None)), ("1200/80", (None, None)), ("12/8", (None, None)),
+    ("120/80/60", (None, None)), ("120-80", (None, None)), ("120.5/80", (None, None)),
+])
+def test_parse_blood_pressure(value, parsed):
+    assert server.parse_blood_pressure(value) == parsed
+
+
+def test_malformed_blood_pressure_scores_no_pressure_triggers():
+    reading = server.score_reading({"blood_pressure": "high", "heart_rate": 72})
+
+    assert (reading["systolic_bp"], reading["diastolic_bp"]) == (None, None)
+    assert reading["ews_triggers"] == {}
+    assert reading["ews_score"] == 0
+
+
+def latest_scores(mongo):
+    return {score["_id"]: score for score in asyncio.run(mongo.early_warning_scores.find().to_list(None))}
+
+
+def test_out_of_order_reading_does_not_replace_a_newer_latest_score(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    newer = api.post("/api/vital-signs", json=vitals_form(patient["id"], "2025-01-01T12:00:00", heart_rate=125)).json()
+
+    older = api.post("/api/vital-signs", json=vitals_form(patient["id"], "2025-01-01T08:00:00"))
+
+    assert older.status_code == 200
+    score = latest_scores(mongo)[patient["id"]]
+    assert (score["vital_signs_id"], score["ews_score"]) == (newer["id"], 2)
+
+
+def test_record_latest_scores_retries_only_lost_upsert_races(api, mongo, patient_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    reading = {
+        "id": "late", "patient_id": patient["id"], "patient_name": "Name P1", "ward_number": "W1", "bed_number": "1",
+        "ews_score": 0, "ews_triggers": {},
+    }
+    newest = {**reading, "id": "newest", "monitoring_datetime": datetime(2025, 1, 2), "ews_score": 4}
+
+    asyncio.run(server.record_latest_scores([newest]))
+    # The filter misses the newer document and the upsert fails on _id, twice
+    asyncio.run(server.record_latest_scores([{**reading, "monitoring_datetime": datetime(2025, 1, 1)}]))
+
+    assert latest_scores(mongo)[patient["id"]]["vital_signs_id"] == "newest"
+
+
+def test_bulk_ingest_keeps_each_patients_newest_reading(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+
+    api.post("/api/vital-signs/bulk", json=[
+        vitals_form(patient["id"], "2025-01-01T12:00:00", spo2=90),
+        vitals_form(patient["id"], "2025-01-01T08:00:00"),
+    ])
+
+    assert latest_scores(mongo)[patient["id"]]["ews_triggers"] == {"spo2": "red"}
+
+
+def test_reading_for_a_discharged_patient_raises_no_alert(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    api.post("/api/vital-signs", json=vitals_form(patient["id"], heart_rate=130))
+    assert [alert["patient_id"] for alert in api.get("/api/alerts").json()] == [patient["id"]]
+
+    api.put(f"/api/patients/{patient['id']}", json={"discharged": "Yes"})
+    api.post("/api/vital-signs", json=vitals_form(patient["id"], "2025-01-02T10:00:00", heart_rate=130))
+
+    assert api.get("/api/alerts").json() == []
+    assert patient["id"] not in latest_scores(mongo)
+
+
+def test_deleting_a_discharged_patients_reading_raises_no_alert(api, mongo, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    api.post("/api/vital-signs", json=vitals_form(patient["id"], "2025-01-01T08:00:00", heart_rate=130))
+    newest = api.post("/api/vital-signs", json=vitals_form(patient["id"], "2025-01-01T12:00:00", heart_rate=130)).json()
+    api.put(f"/api/patients/{patient['id']}", json={"discharged": "Yes"})
+    # As if the discharge and a late reading raced
+    asyncio.run(mongo.early_warning_scores.update_one(
+        {"_id": patient["id"]}, {"$set": {"vital_signs_id": newest["id"], "ews_score": 2}}, upsert=True
+    ))
+
+    api.delete(f"/api/vital-signs/{newest['id']}")
+
+    assert patient["id"] not in latest_scores(mongo)
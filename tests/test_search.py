@@ -0,0 +1,77 @@
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("text, words", [
+    ("Sarah Johnson", ["sarah", "johnson"]),
+    ("O'Brien-Smith", ["o", "brien", "smith"]),
+    ("Zoë Ångström", ["zoe", "angstrom"]),
+    ("MAT-001", ["mat", "001"]),
+    ("snake_case", ["snake", "case"]),
+    ("  --  ", []),
+    (None, []),
+])
+def test_tokenizer_splits_on_anything_but_letters_and_digits(text, words):
+    assert server.normalize_search_text(text) == words
+
+
+def test_search_fields_index_word_prefixes_and_the_joined_patient_id():
+    fields = server.build_search_fields({"full_name": "Ann Lee", "patient_id": "MAT-001", "ward_number": "W1"})
+
+    assert {"a", "an", "ann", "l", "le", "lee", "mat", "001", "mat0", "mat001", "w1"} <= set(fields["search_prefixes"])
+    assert "nn" not in fields["search_prefixes"]
+    assert {"  a", " an", "ann", "nn "} <= set(fields["search_trigrams"])
+
+
+def test_prefixes_stop_at_the_maximum_length():
+    word = "a" * (server.SEARCH_PREFIX_MAX + 5)
+
+    prefixes = server.build_search_fields({"full_name": word})["search_prefixes"]
+
+    assert max(map(len, prefixes)) == server.SEARCH_PREFIX_MAX
+
+
+@pytest.fixture
+def ward(api, patient_form):
+    for bed_number, (patient_id, full_name, ward_number) in enumerate((
+        ("MAT-001", "Sarah Johnson", "W1"), ("MAT-002", "Zoë Jones", "W2"), ("GYN-101", "Amy Johns", "W1"),
+    )):
+        created = api.post("/api/patients", json=patient_form(patient_id, str(bed_number), ward_number=ward_number, full_name=full_name))
+        assert created.status_code == 200
+    return api
+
+
+def found(api, search, mode=None):
+    params = {"search": search, **({"mode": mode} if mode else {})}
+    return sorted(patient["full_name"] for patient in api.get("/api/patients", params=params).json())
+
+
+@pytest.mark.parametrize("search, names", [
+    ("joh", ["Amy Johns", "Sarah Johnson"]),
+    ("Johnson", ["Sarah Johnson"]),
+    ("sarah joh", ["Sarah Johnson"]),
+    ("JO", ["Amy Johns", "Sarah Johnson", "Zoë Jones"]),
+    ("zoe", ["Zoë Jones"]),
+    ("mat-00", ["Sarah Johnson", "Zoë Jones"]),
+    ("mat001", ["Sarah Johnson"]),
+    ("w2", ["Zoë Jones"]),
+    # Matching is by word prefix: fragments inside a word and longer words do not match
+    ("ohnson", []),
+    ("johnsons", []),
+    ("sarah jones", []),
+    # A search without any words filters nothing
+    ("--", ["Amy Johns", "Sarah Johnson", "Zoë Jones"]),
+])
+def test_prefix_search(ward, search, names):
+    assert found(ward, search) == names
+
+
+@pytest.mark.parametrize("search, names", [
+    ("ohnson", ["Sarah Johnson"]),
+    ("jonhson", ["Sarah Johnson"]),
+    ("zoey", ["Zoë Jones"]),
+    ("xyz", []),
+])
+def test_fuzzy_search_matches_by_shared_trigrams(ward, search, names):
+    assert found(ward, search, mode="fuzzy") == names
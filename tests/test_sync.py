@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def no_overlap(monkeypatch):
+    # Without the overlap window a caught-up token resends nothing
+    monkeypatch.setattr(server, "SYNC_OVERLAP_SECONDS", 0)
+
+
+def sync_all(api, token=None, limit=1000):
+    """Follow next_token until has_more is false; returns the pages and the last token."""
+    pages = []
+    while True:
+        response = api.get("/api/sync", params={"limit": limit, **({"since": token} if token else {})})
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        token = page["next_token"]
+        if not page["has_more"]:
+            return pages, token
+
+
+def synced_ids(pages, kind):
+    return [record["id"] for page in pages for record in page[kind]]
+
+
+def test_full_sync_then_nothing_until_a_change(api, patient_form, vitals_form):
+    patient = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    reading = api.post("/api/vital-signs", json=vitals_form(patient["id"])).json()
+
+    pages, token = sync_all(api)
+
+    assert (synced_ids(pages, "patients"), synced_ids(pages, "vital_signs")) == ([patient["id"]], [reading["id"]])
+    assert pages[-1]["reset"] is False
+    time.sleep(0.01)
+    pages, token = sync_all(api, token)
+    assert synced_ids(pages, "patients") + synced_ids(pages, "vital_signs") == []
+
+    api.put(f"/api/patients/{patient['id']}", json={"notes": "Comfortable"})
+    pages, _ = sync_all(api, token)
+    assert [record["notes"] for page in pages for record in page["patients"]] == ["Comfortable"]
+
+
+def test_token_round_trips_as_five_keys(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+
+    token = sync_all(api)[1]
+
+    values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    assert len(values) == 5
+    for index in (0, 2, 4):
+        datetime.fromisoformat(values[index])
+    assert server.decode_cursor(token, 5) == values
+
+
+@pytest.mark.parametrize("token", [
+    "garbage",
+    server.encode_cursor(["2025-01-01T00:00:00", "", "2025-01-01T00:00:00", ""]),
+    server.encode_cursor(["yesterday", "", "2025-01-01T00:00:00", "", "2025-01-01T00:00:00"]),
+    server.encode_cursor(["2025-01-01T00:00:00", {"$gt": ""}, "2025-01-01T00:00:00", "", "2025-01-01T00:00:00"]),
+])
+def test_invalid_token_is_400(api, token):
+    assert api.get("/api/sync", params={"since": token}).status_code == 400
+
+
+def test_token_older_than_the_tombstones_resets_the_replica(api, patient_form):
+    api.post("/api/patients", json=patient_form("P1", "1"))
+    expired = (datetime.utcnow() - timedelta(seconds=server.SYNC_TOMBSTONE_TTL_SECONDS + 60)).isoformat()
+
+    page = api.get("/api/sync", params={"since": server.encode_cursor([expired, "", expired, "", expired])}).json()
+
+    assert page["reset"] is True
+    assert len(page["patients"]) == 1
+
+
+def test_deletes_arrive_as_tombstones_once(api, patient_form, vitals_form):
+    kept = api.post("/api/patients", json=patient_form("P1", "1")).json()
+    removed = api.post("/api/patients", json=patient_form("P2", "2")).json()
+    reading = api.post("/api/vital-signs", json=vitals_form(kept["id"])).json()
+    token = sync_all(api)[1]
+    time.sleep(0.01)
+
+    api.delete(f"/api/vital-signs/{reading['id']}")
+    api.delete(f"/api/patients/{removed['id']}")
+    pages, token = sync_all(api, token)
+
+    assert pages[-1]["deleted"] == {"patients": [removed["id"]], "vital_signs": [reading["id"]]}
+    time.sleep(0.01)
+    assert sync_all(api, token)[0][-1]["deleted"] == {"patients": [], "vital_signs": []}
+
+
+def test_tombstones_are_kept_until_the_last_page_of_upserts(api, patient_form):
+    removed = api.post("/api/patients", json=patient_form("P0", "0")).json()
+    token = sync_all(api)[1]
+    time.sleep(0.01)
+    api.delete(f"/api/patients/{removed['id']}")
+    for index in range(1, 4):
+        api.post("/api/patients", json=patient_form(f"P{index}", str(index)))
+
+    pages, _ = sync_all(api, token, limit=1)
+
+    assert len(pages) == 3
+    assert all(removed["id"] in page["deleted"]["patients"] for page in pages)
+
+
+def test_ties_on_updated_at_are_paged_by_id(api, mongo):
+    written = datetime(2025, 1, 1)
+    asyncio.run(mongo.patients.insert_many([
+        {
+            "id": f"id-{index}", "patient_id": f"P{index}", "full_name": f"Name P{index}", "birthdate": datetime(1990, 1, 1),
+            "address": "1 Main Street", "ward_number": "W1", "bed_number": str(index), "admission_date": datetime(2025, 1, 1),
+            "diagnosis": "Observation", "high_risk": "No", "discharged": "No", "created_at": written, "updated_at": written,
+        }
+        for index in (3, 0, 4, 1, 2)
+    ]))
+
+    pages, _ = sync_all(api, limit=2)
+
+    assert [[patient["id"] for patient in page["patients"]] for page in pages] == [
+        ["id-0", "id-1"], ["id-2", "id-3"], ["id-4"],
+    ]
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+
+# Two patients, readings spread over several 6-hour buckets, with ties on time
+READING_TIMES = [
+    ("P1", "2025-01-01T01:00:00"), ("P1", "2025-01-01T02:00:00"), ("P1", "2025-01-01T02:00:00"),
+    ("P1", "2025-01-01T09:00:00"), ("P1", "2025-01-02T03:00:00"),
+    ("P2", "2025-01-01T02:00:00"), ("P2", "2025-01-01T13:00:00"), ("P2", "2025-01-01T13:00:00"),
+]
+
+
+@pytest.fixture(params=["documents", "buckets"])
+def store(request, mongo, monkeypatch):
+    store = server.get_vitals_store(request.param)
+    monkeypatch.setattr(server, "vitals_store", store)
+    monkeypatch.setitem(server.INDEXES, store.collection_name, store.indexes)
+    return store
+
+
+@pytest.fixture
+def readings(store, api, patient_form, vitals_form):
+    """The stored readings, newest first."""
+    patients = {
+        patient_id: api.post("/api/patients", json=patient_form(patient_id, patient_id[1:])).json()["id"]
+        for patient_id in ("P1", "P2")
+    }
+    created = [
+        api.post("/api/vital-signs", json=vitals_form(patients[patient_id], moment)).json()
+        for patient_id, moment in READING_TIMES
+    ]
+    return sorted(created, key=lambda reading: (reading["monitoring_datetime"], reading["id"]), reverse=True)
+
+
+def page_through(store, query, limit, fields=None):
+    pages = []
+    after = None
+    while True:
+        page = asyncio.run(store.find_page(query, after, limit, fields))
+        if not page:
+            return pages
+        pages.append([reading["id"] for reading in page])
+        after = (page[-1]["monitoring_datetime"], page[-1]["id"])
+
+
+def test_pages_cover_every_reading_newest_first(store, readings):
+    for limit in (1, 2, 3, 100):
+        pages = page_through(store, {}, limit)
+
+        assert [reading_id for page in pages for reading_id in page] == [reading["id"] for reading in readings]
+        assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_pages_of_one_patient(store, readings):
+    patient_db_id = readings[0]["patient_id"]
+
+    pages = page_through(store, {"patient_id": patient_db_id}, 2)
+
+    expected = [reading["id"] for reading in readings if reading["patient_id"] == patient_db_id]
+    assert [reading_id for page in pages for reading_id in page] == expected
+
+
+def test_pages_with_fields_keep_the_page_key(store, readings):
+    page = asyncio.run(store.find_page({}, None, 2, ["heart_rate"]))
+
+    assert [(reading["id"], reading["heart_rate"]) for reading in page] == [(reading["id"], 70) for reading in readings[:2]]
+    assert "temperature" not in page[0]
+
+
+def test_find_one(store, readings):
+    found = asyncio.run(store.find_one(readings[3]["id"]))
+
+    assert (found["id"], found["patient_name"], found["monitoring_datetime"]) == (
+        readings[3]["id"], readings[3]["patient_name"], datetime.fromisoformat(readings[3]["monitoring_datetime"])
+    )
+    assert asyncio.run(store.find_one("missing")) is None
+
+
+def test_delete_one_returns_the_reading_and_keeps_the_others(store, readings):
+    # The first is alone in its bucket; the last shares one with a tie
+    for deleted in (readings[0], readings[-1]):
+        assert asyncio.run(store.delete_one(deleted["id"]))["id"] == deleted["id"]
+        assert asyncio.run(store.find_one(deleted["id"])) is None
+    assert asyncio.run(store.delete_one(readings[0]["id"])) is None
+
+    remaining = [reading["id"] for reading in readings[1:-1]]
+    assert [reading_id for page in page_through(store, {}, 3) for reading_id in page] == remaining
+    for reading_id in remaining:
+        assert asyncio.run(store.find_one(reading_id))["id"] == reading_id
+
+
+def sync_all(store, after, limit):
+    synced = []
+    while True:
+        page, after, has_more = asyncio.run(store.find_sync_page(after, limit))
+        synced.extend(reading["id"] for reading in page)
+        if not has_more:
+            return synced, after
+
+
+def test_sync_pages_cover_every_reading_once(store, readings):
+    for limit in (1, 3, 100):
+        synced, _ = sync_all(store, None, limit)
+
+        assert sorted(synced) == sorted(reading["id"] for reading in readings)
+
+
+def test_sync_resumes_after_its_key_with_new_and_rewritten_readings(store, readings, api, vitals_form):
+    _, key = sync_all(store, None, 3)
+    assert sync_all(store, key, 3)[0] == []
+
+    # A late reading for an old window lands in an existing bucket
+    late = api.post("/api/vital-signs", json=vitals_form(readings[-1]["patient_id"], "2025-01-01T03:00:00")).json()
+    synced, key = sync_all(store, key, 3)
+
+    assert late["id"] in synced
+    assert sync_all(store, key, 3)[0] == []
+
+
+def test_move_rewrites_every_reading_and_merges_shared_windows(store, readings, api, mongo, vitals_form):
+    patient_db_id = next(reading["patient_id"] for reading in readings if reading["patient_name"] == "Name P1")
+    asyncio.run(mongo.patients.update_one({"id": patient_db_id}, {"$set": {"ward_number": "W2", "bed_number": "9"}}))
+    server.patient_cache.invalidate(patient_db_id)
+    # Written under the new ward and bed into a window the patient already has readings in
+    moved_in = api.post("/api/vital-signs", json=vitals_form(patient_db_id, "2025-01-01T01:30:00")).json()
+    meta = {"patient_name": "Name P1", "ward_number": "W2", "bed_number": "9"}
+
+    while asyncio.run(store.propagate_patient(patient_db_id, meta, 2)):
+        pass
+
+    expected = [reading["id"] for reading in readings if reading["patient_id"] == patient_db_id] + [moved_in["id"]]
+    moved = [asyncio.run(store.find_one(reading_id)) for reading_id in expected]
+    assert {(reading["ward_number"], reading["bed_number"]) for reading in moved} == {("W2", "9")}
+    paged = [reading_id for page in page_through(store, {"patient_id": patient_db_id}, 2) for reading_id in page]
+    assert sorted(paged) == sorted(expected)
+    if isinstance(store, server.BucketedVitalSignsStore):
+        windows = asyncio.run(mongo[store.collection_name].distinct("bucket_start", {"patient_id": patient_db_id}))
+        assert asyncio.run(mongo[store.collection_name].count_documents({"patient_id": patient_db_id})) == len(windows)